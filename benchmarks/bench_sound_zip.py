@@ -0,0 +1,74 @@
+# --- Filename: benchmarks/bench_sound_zip.py ---
+# Compares the old "zipf.write() every sound into every bike archive" packaging
+# against compressing each sound once and storing the same deflated bytes per bike.
+#
+#   python -m benchmarks.bench_sound_zip --seconds 30 --bikes 14
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.packaging_sounds import compress_sound_files, write_compressed_sound
+from benchmarks.synthetic_assets import write_sound_set
+
+def package_legacy(out_dir, bike_ids, sound_paths):
+    for bike_id in bike_ids:
+        with zipfile.ZipFile(os.path.join(out_dir, f"{bike_id}.zip"), 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for sound_path in sound_paths.values():
+                zipf.write(sound_path, f"{bike_id}/{os.path.basename(sound_path)}")
+
+def package_shared(out_dir, bike_ids, sound_paths):
+    compressed_sounds = compress_sound_files(sound_paths)
+    for bike_id in bike_ids:
+        with zipfile.ZipFile(os.path.join(out_dir, f"{bike_id}.zip"), 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for sound in compressed_sounds.values():
+                write_compressed_sound(zipf, f"{bike_id}/{sound.filename}", sound)
+
+def time_best_of(fn, repeat, *args):
+    best_wall, best_cpu = math.inf, math.inf
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        fn(*args)
+        best_wall = min(best_wall, time.perf_counter() - wall)
+        best_cpu = min(best_cpu, time.process_time() - cpu)
+    return best_wall, best_cpu
+
+def archives_match(dir_a, dir_b, bike_ids):
+    for bike_id in bike_ids:
+        with zipfile.ZipFile(os.path.join(dir_a, f"{bike_id}.zip")) as a, zipfile.ZipFile(os.path.join(dir_b, f"{bike_id}.zip")) as b:
+            if a.testzip() is not None or b.testzip() is not None: return False
+            if a.namelist() != b.namelist(): return False
+            if any(a.read(name) != b.read(name) for name in a.namelist()): return False
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per-bike sound compression against compress-once packaging.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of each synthetic WAV")
+    parser.add_argument("--bikes", type=int, default=14, help="Number of bike archives to build")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant; the best one is reported")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sound_paths = write_sound_set(tmp, args.seconds)
+        input_bytes = sum(os.path.getsize(p) for p in sound_paths.values())
+        bike_ids = [f"BIKE{i}" for i in range(args.bikes)]
+        legacy_dir, shared_dir = os.path.join(tmp, "legacy"), os.path.join(tmp, "shared")
+        os.makedirs(legacy_dir); os.makedirs(shared_dir)
+
+        legacy_wall, legacy_cpu = time_best_of(package_legacy, args.repeat, legacy_dir, bike_ids, sound_paths)
+        shared_wall, shared_cpu = time_best_of(package_shared, args.repeat, shared_dir, bike_ids, sound_paths)
+
+        print(f"{len(sound_paths)} sounds, {input_bytes / 1e6:.1f} MB input, {args.bikes} bikes")
+        print(f"  legacy (write per bike):  wall {legacy_wall:7.3f}s  cpu {legacy_cpu:7.3f}s  read {input_bytes * args.bikes / 1e6:8.1f} MB")
+        print(f"  shared (compress once):   wall {shared_wall:7.3f}s  cpu {shared_cpu:7.3f}s  read {input_bytes / 1e6:8.1f} MB")
+        print(f"  speed-up: {legacy_wall / shared_wall:.1f}x wall, {legacy_cpu / max(shared_cpu, 1e-9):.1f}x cpu")
+        identical = archives_match(legacy_dir, shared_dir, bike_ids)
+        print(f"  archive contents identical: {identical}")
+        return 0 if identical else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
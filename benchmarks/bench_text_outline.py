@@ -0,0 +1,99 @@
+# --- Filename: benchmarks/bench_text_outline.py ---
+# Times the text outline engine against the old "stamp the string (2n+1)^2 - 1 times"
+# loop for outline sizes 0..20, and checks the square outline stays within a pixel-diff
+# tolerance of the old output (composited over a background, as it ends up in a preview).
+#
+#   python -m benchmarks.bench_text_outline --font path/to/font.ttf
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageStat
+from src.preview_rendering import _rasterize_text
+
+FALLBACK_FONTS = ["arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"]
+
+# Allowed difference between the old and new square outline, in 0-255 channel units. Both accumulate
+# coverage the same way; only 8-bit rounding on anti-aliased edge pixels should differ.
+MAX_MEAN_DIFF = 0.25
+MAX_EDGE_PIXEL_RATIO = 0.001
+EDGE_THRESHOLD = 48
+
+def rasterize_legacy(text, font, text_color, outline_size, outline_color):
+    text_bbox = font.getbbox(text)
+    padding = outline_size * 2
+    txt_img = Image.new('RGBA', (text_bbox[2] - text_bbox[0] + padding, text_bbox[3] - text_bbox[1] + padding), (255, 255, 255, 0))
+    d = ImageDraw.Draw(txt_img)
+    draw_pos = (padding/2 - text_bbox[0], padding/2 - text_bbox[1])
+    if outline_size > 0:
+        for i in range(-outline_size, outline_size + 1):
+            for j in range(-outline_size, outline_size + 1):
+                if i != 0 or j != 0:
+                    d.text((draw_pos[0] + i, draw_pos[1] + j), text, font=font, fill=outline_color)
+    d.text(draw_pos, text, font=font, fill=text_color)
+    return txt_img
+
+def composite(sprite, background=(90, 140, 200, 255)):
+    canvas = Image.new('RGBA', sprite.size, background)
+    canvas.paste(sprite, (0, 0), sprite)
+    return canvas.convert('RGB')
+
+def diff_stats(a, b):
+    diff = ImageChops.difference(composite(a), composite(b)).convert('L')
+    mean = ImageStat.Stat(diff).mean[0]
+    edge_pixels = sum(diff.histogram()[EDGE_THRESHOLD:])
+    return mean, edge_pixels / (diff.width * diff.height)
+
+def time_best_of(fn, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter(); fn(); best = min(best, time.perf_counter() - start)
+    return best
+
+def find_font(path):
+    for candidate in ([path] if path else FALLBACK_FONTS):
+        try:
+            ImageFont.truetype(candidate, 10)
+            return candidate
+        except (IOError, OSError): continue
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark and verify the text outline engine.")
+    parser.add_argument("--font", help="TrueType font to render with (defaults to Arial/DejaVu Sans if installed)")
+    parser.add_argument("--size", type=int, default=160, help="Font size; large outlined titles are the slow case")
+    parser.add_argument("--text", default="SMX Sound Mod")
+    parser.add_argument("--max-outline", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    font_path = find_font(args.font)
+    if font_path is None:
+        print("No TrueType font found; pass one with --font"); return 2
+    font = ImageFont.truetype(font_path, args.size)
+    fill, outline = "#FFFFFF", "#000000"
+
+    print(f"font {os.path.basename(font_path)} @ {args.size}px, text {args.text!r}")
+    print(f"{'outline':>7} {'legacy ms':>10} {'square ms':>10} {'round ms':>9} {'speed-up':>9} {'mean diff':>10} {'edge px':>8}")
+    failures = []
+    for outline_size in range(args.max_outline + 1):
+        legacy = time_best_of(lambda: rasterize_legacy(args.text, font, fill, outline_size, outline), args.repeat)
+        square = time_best_of(lambda: _rasterize_text(args.text, font_path, args.size, fill, outline_size, outline, "square", 0), args.repeat)
+        round_ = time_best_of(lambda: _rasterize_text(args.text, font_path, args.size, fill, outline_size, outline, "round", 0), args.repeat)
+        mean, edge_ratio = diff_stats(
+            rasterize_legacy(args.text, font, fill, outline_size, outline),
+            _rasterize_text(args.text, font_path, args.size, fill, outline_size, outline, "square", 0))
+        ok = mean <= MAX_MEAN_DIFF and edge_ratio <= MAX_EDGE_PIXEL_RATIO
+        if not ok: failures.append(outline_size)
+        print(f"{outline_size:>7} {legacy * 1000:>10.2f} {square * 1000:>10.2f} {round_ * 1000:>9.2f} {legacy / square:>8.1f}x {mean:>10.3f} {edge_ratio:>8.3%}{'' if ok else '  FAIL'}")
+
+    if failures:
+        print(f"Square outline exceeded the pixel-diff tolerance for sizes: {failures}"); return 1
+    print(f"Square outline within tolerance (mean diff <= {MAX_MEAN_DIFF}, edge pixels <= {MAX_EDGE_PIXEL_RATIO:.1%}) for all sizes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
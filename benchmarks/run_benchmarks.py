@@ -0,0 +1,203 @@
+# --- Filename: benchmarks/run_benchmarks.py ---
+# Reproducible benchmark suite for the rendering and packaging hot paths. Generates synthetic
+# assets (WAVs, a large background, a thumbnail for every bike), times each stage and a full
+# 14-bike build, and writes wall time, throughput and the process's peak RSS so far to a JSON file
+# so runs can be compared across commits.
+#
+#   python -m benchmarks.run_benchmarks                       # writes benchmarks/results/<time>_<commit>.json
+#   python -m benchmarks.run_benchmarks --compare old.json    # also prints the change against an earlier run
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+import PIL
+from PIL import Image, ImageFont
+from src.bike_data import BIKE_DATA
+from src.packaging_sounds import create_sound_mod_package
+from src.preview_rendering import PreviewComposer, draw_rotated_text, paste_rotated_image, generate_preview_image
+from src.render_plan import PREVIEW_SIZE, compile_render_plan
+from src.render_cache import image_cache, font_cache, sprite_cache, prefix_cache
+from benchmarks.synthetic_assets import write_sound_set, write_background, write_thumbnails, benchmark_scene
+
+DISPLAY_SIZE = (640, 360)
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+def cumulative_peak_rss_bytes():
+    # Peak resident set size of this process over its whole lifetime so far (and, on POSIX, the largest
+    # peak of any finished worker process). The OS only keeps the running maximum, so a stage's value
+    # is its own peak only when it exceeds every earlier stage's.
+    try:
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+        return {"self": own, "children": children}
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD), ("PeakWorkingSetSize", ctypes.c_size_t),
+                        ("WorkingSetSize", ctypes.c_size_t), ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS(); counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return {"self": counters.PeakWorkingSetSize, "children": None}
+    except Exception:
+        return {"self": None, "children": None}
+
+def clear_render_caches():
+    image_cache.clear(); font_cache.clear(); sprite_cache.clear(); prefix_cache.clear()
+
+def git_commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return "unknown"
+
+def run_stage(name, fn, repeat, items=1, item_unit="ops", bytes_per_run=None, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    result = {
+        "wall_s": {"min": best, "mean": statistics.mean(times), "max": max(times), "runs": times},
+        "throughput": {f"{item_unit}_per_s": items / best if best else math.inf},
+        "cumulative_peak_rss_bytes": cumulative_peak_rss_bytes(),
+    }
+    if bytes_per_run: result["throughput"]["mb_per_s"] = bytes_per_run / 1e6 / best if best else math.inf
+    print(f"  {name:<32} min {best * 1000:9.1f} ms  mean {statistics.mean(times) * 1000:9.1f} ms  {items / best:8.2f} {item_unit}/s")
+    return result
+
+DISPLAY_SCALE = DISPLAY_SIZE[0] / PREVIEW_SIZE[0]
+
+def preview_like_render(composer, bike_id):
+    # What ImagePreviewer.render_preview does for one frame, minus handing the image to Tk.
+    # A full-size composer is the "high-quality preview" path; a display-scale one is the default.
+    rgb_img = composer.render(bike_id).convert('RGB')
+    if composer.scale == 1.0: rgb_img.thumbnail(DISPLAY_SIZE, Image.Resampling.LANCZOS)
+    return rgb_img
+
+def make_composer(scene, mod_name, thumbs, scale=1.0, prefix_cache=None):
+    return PreviewComposer(compile_render_plan(scene, mod_name, thumbs, BIKE_DATA, PREVIEW_SIZE, scale), prefix_cache)
+
+def run_suite(args, workdir):
+    bike_ids = [bike_id for _, bike_id in BIKE_DATA]
+    print(f"Generating synthetic assets in {workdir} ...")
+    sound_paths = write_sound_set(workdir, args.seconds)
+    background = write_background(os.path.join(workdir, "background.png"), tuple(args.background_size))
+    thumbs = write_thumbnails(os.path.join(workdir, "thumbs"), bike_ids)
+    scene = benchmark_scene(background, args.font)
+    title = scene[-1]
+    sound_bytes = sum(os.path.getsize(p) for p in sound_paths.values())
+    mod_name = "Benchmark Mod"
+    stages = {}
+
+    print("Stages:")
+    with Image.open(background) as bg: background_rgba = bg.convert("RGBA")
+    canvas = Image.new("RGBA", PREVIEW_SIZE)
+    stages["draw_rotated_text"] = run_stage("draw_rotated_text (cold)", lambda: draw_rotated_text(canvas, mod_name, title), args.repeat, setup=clear_render_caches)
+    stages["draw_rotated_text_cached"] = run_stage("draw_rotated_text (sprite cached)", lambda: draw_rotated_text(canvas, mod_name, title), args.repeat)
+    stages["paste_rotated_image"] = run_stage("paste_rotated_image", lambda: paste_rotated_image(canvas, background_rgba, scene[1]), args.repeat)
+    stages["generate_preview_image_cold"] = run_stage(
+        "generate_preview_image (cold)", lambda: generate_preview_image(bike_ids[0], mod_name, thumbs, scene, BIKE_DATA), args.repeat, setup=clear_render_caches)
+
+    def render_all_bikes():
+        composer = make_composer(scene, mod_name, thumbs)
+        for bike_id in bike_ids: generate_preview_image(bike_id, mod_name, thumbs, scene, BIKE_DATA, composer=composer)
+    stages["generate_preview_image_all_bikes"] = run_stage(
+        "generate_preview_image x14 (cold)", render_all_bikes, args.repeat, items=len(bike_ids), item_unit="bikes", setup=clear_render_caches)
+
+    for suffix, scale in (("", DISPLAY_SCALE), ("_high_quality", 1.0)):
+        composer = make_composer(scene, mod_name, thumbs, scale)
+        label = "preview render" + (" HQ" if scale == 1.0 else "")
+        stages[f"preview_render_cold{suffix}"] = run_stage(
+            f"{label} (cold)", lambda: preview_like_render(make_composer(scene, mod_name, thumbs, scale), bike_ids[0]), args.repeat, item_unit="frames", setup=clear_render_caches)
+        stages[f"preview_render_warm{suffix}"] = run_stage(
+            f"{label} (next bike)", lambda: [preview_like_render(composer, b) for b in bike_ids], args.repeat, items=len(bike_ids), item_unit="frames")
+
+    # Live editing: each tweak of the top text layer builds a new composer for the edited scene;
+    # with the prefix cache it resumes from the composite of the unchanged layers below
+    def edit_top_layer(use_prefix_cache):
+        colors = ["#FF0000", "#00FF00", "#0000FF", "#FFFF00", "#FF00FF"]
+        def run():
+            for color in colors:
+                edited = scene[:-1] + [dict(scene[-1], color=color)]
+                preview_like_render(make_composer(edited, mod_name, thumbs, DISPLAY_SCALE, prefix_cache if use_prefix_cache else None), bike_ids[0])
+        return run
+    preview_like_render(make_composer(scene, mod_name, thumbs, DISPLAY_SCALE, prefix_cache), bike_ids[0])
+    stages["preview_edit_top_layer"] = run_stage("preview edit top layer x5", edit_top_layer(False), args.repeat, items=5, item_unit="frames")
+    stages["preview_edit_top_layer_prefix_cached"] = run_stage("preview edit top layer x5 (prefix)", edit_top_layer(True), args.repeat, items=5, item_unit="frames")
+
+    library = os.path.join(workdir, "library")
+    os.makedirs(library, exist_ok=True)
+    log_lines = []
+    def build(workers):
+        return lambda: create_sound_mod_package(library, mod_name, bike_ids, sound_paths, thumbs, scene, BIKE_DATA, log_lines.append, workers=workers, incremental=False)
+    stages["package_full_sequential"] = run_stage(
+        "create_sound_mod_package x14 (1 worker)", build(1), args.repeat, items=len(bike_ids), item_unit="bikes", bytes_per_run=sound_bytes * len(bike_ids), setup=clear_render_caches)
+    stages["package_full_parallel"] = run_stage(
+        f"create_sound_mod_package x14 ({args.workers or 'auto'} workers)", build(args.workers), args.repeat, items=len(bike_ids), item_unit="bikes", bytes_per_run=sound_bytes * len(bike_ids), setup=clear_render_caches)
+    stages["package_incremental_noop"] = run_stage(
+        "create_sound_mod_package x14 (unchanged)", lambda: create_sound_mod_package(library, mod_name, bike_ids, sound_paths, thumbs, scene, BIKE_DATA, log_lines.append), args.repeat, items=len(bike_ids), item_unit="bikes")
+    if any("ERROR" in line for line in log_lines):
+        print("WARNING: packaging logged errors:"); print("\n".join(l for l in log_lines if "ERROR" in l))
+    return stages, {"sound_bytes": sound_bytes, "bikes": len(bike_ids)}
+
+def compare(current, previous_path):
+    with open(previous_path, 'r') as f: previous = json.load(f)
+    print(f"\nCompared with {os.path.basename(previous_path)} ({previous['meta'].get('commit')}):")
+    for name, stage in current["stages"].items():
+        old = previous.get("stages", {}).get(name)
+        if not old: print(f"  {name:<34} (new)"); continue
+        new_t, old_t = stage["wall_s"]["min"], old["wall_s"]["min"]
+        print(f"  {name:<34} {old_t * 1000:9.1f} ms -> {new_t * 1000:9.1f} ms  ({old_t / new_t if new_t else math.inf:5.2f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the rendering and packaging hot paths.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of each synthetic WAV")
+    parser.add_argument("--background-size", type=int, nargs=2, default=[3840, 2160], metavar=("W", "H"))
+    parser.add_argument("--font", default="arial.ttf", help="Font used for the text layers")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes for the parallel build (0 = one per core)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; min, mean and max are recorded")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    try: ImageFont.truetype(args.font, 10)
+    except (IOError, OSError): print(f"WARNING: font '{args.font}' not found; text layers fall back to Pillow's default font")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        stages, inputs = run_suite(args, workdir)
+
+    commit = git_commit()
+    result = {
+        "meta": {
+            "commit": commit, "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(), "pillow": PIL.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "args": vars(args), "inputs": inputs,
+        },
+        "stages": stages,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f: json.dump(result, f, indent=4)
+    print(f"\nResults written to {output}")
+    if args.compare: compare(result, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# --- Filename: benchmarks/synthetic_assets.py ---
+# Reproducible stand-ins for real mod inputs: engine-like WAVs, large backgrounds and bike thumbnails.
+import math
+import os
+import random
+import sys
+import wave
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PIL import Image, ImageDraw
+
+SOUND_NAMES = ["engine", "idle", "low", "high"]
+
+def write_synthetic_wav(path, seconds, sample_rate=44100, seed=0):
+    # An engine-like harmonic tone plus noise: compresses about as badly as real recordings
+    rng = random.Random(seed)
+    base = 40 + seed * 15
+    step, step2 = 2 * math.pi * base / sample_rate, 2 * math.pi * base * 2.01 / sample_rate
+    samples = array('h')
+    for n in range(int(seconds * sample_rate)):
+        value = 0.5 * math.sin(step * n) + 0.25 * math.sin(step2 * n) + rng.uniform(-0.2, 0.2)
+        sample = int(max(-1.0, min(1.0, value)) * 32767)
+        samples.append(sample); samples.append(sample)
+    if sys.byteorder != "little": samples.byteswap()
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(2); w.setsampwidth(2); w.setframerate(sample_rate)
+        w.writeframes(samples.tobytes())
+    return path
+
+def write_sound_set(folder, seconds, sample_rate=44100):
+    return {name: write_synthetic_wav(os.path.join(folder, f"{name}.wav"), seconds, sample_rate, seed=i) for i, name in enumerate(SOUND_NAMES)}
+
+def write_background(path, size=(3840, 2160), seed=0):
+    # Gradient plus noise so PNG/JPEG encoders can't shortcut it
+    random.seed(seed)
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40)
+    image = Image.merge("RGB", (gradient, noise, gradient.rotate(90, expand=False)))
+    image.save(path)
+    return path
+
+def write_thumbnails(folder, bike_ids, size=(1920, 1080)):
+    os.makedirs(folder, exist_ok=True)
+    for i, bike_id in enumerate(bike_ids):
+        image = Image.new("RGBA", size, (0, 0, 0, 0))
+        d = ImageDraw.Draw(image)
+        w, h = size
+        d.ellipse((w * 0.1, h * 0.45, w * 0.4, h * 0.9), fill=(30, 30, 30, 255), outline=(200, 200, 200, 255), width=12)
+        d.ellipse((w * 0.6, h * 0.45, w * 0.9, h * 0.9), fill=(30, 30, 30, 255), outline=(200, 200, 200, 255), width=12)
+        d.polygon([(w * 0.25, h * 0.6), (w * 0.45, h * 0.2), (w * 0.7, h * 0.25), (w * 0.75, h * 0.65)], fill=((i * 53) % 256, (i * 97) % 256, 180, 255))
+        image.save(os.path.join(folder, f"{bike_id}.png"))
+    return folder
+
+def benchmark_scene(background_path, font_path="arial.ttf"):
+    # The default layout plus the layers that dominate real mods: a full-screen image background,
+    # a big outlined title and a rotated overlay image
+    return [
+        {"name": "Background", "type": "background", "visible": True, "path": background_path, "color": "#FFFFFF", "pos_x": 960, "pos_y": 540, "scale": 1.0, "rotation": 0, "aspect_ratio": "stretch"},
+        {"name": "Logo", "type": "image", "visible": True, "path": background_path, "pos_x": 1650, "pos_y": 200, "scale": 0.2, "rotation": 15, "aspect_ratio": "fit"},
+        {"name": "Bike Image", "type": "bike_image", "visible": True, "pos_x": 960, "pos_y": 540, "scale": 0.85, "rotation": 0, "aspect_ratio": "fit"},
+        {"name": "Bike Name", "type": "text", "visible": True, "dataSource": "Bike Name", "staticText": "", "font_path": font_path, "size": 80, "color": "#FFFFFF", "pos_x": 960, "pos_y": 80, "outline_size": 2, "outline_color": "#000000", "outline_shape": "square", "rotation": 0},
+        {"name": "Mod Name", "type": "text", "visible": True, "dataSource": "Mod Name", "staticText": "", "font_path": font_path, "size": 140, "color": "#FFCC00", "pos_x": 960, "pos_y": 960, "outline_size": 12, "outline_color": "#000000", "outline_shape": "square", "rotation": -3},
+    ]
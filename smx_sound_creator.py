@@ -1,4 +1,5 @@
 # --- Filename: smx_sound_creator.py ---
+from src import startup_trace # First, so the startup trace includes every other import
 import tkinter as tk
 from tkinter import filedialog, font, messagebox
 import ttkbootstrap as ttk
@@ -7,30 +8,27 @@ from ttkbootstrap.scrolled import ScrolledFrame, ScrolledText
 from PIL import Image, ImageTk, ImageDraw, ImageFont
 import os
 import sys
-import json
 import platform
-import uuid
+import multiprocessing
+import threading
+import queue
+import traceback
 
 if platform.system() == "Windows":
     import winsound
 
-from src.settings_ui import SettingsFrame
+# SettingsFrame and the packager are imported when first needed (see App._frame_class, create_mod_package)
 from src.image_previewer import ImagePreviewer
-from src.packaging_sounds import create_sound_mod_package
+from src.preview_rendering import default_preview_elements
+from src.bike_data import BIKE_DATA
+from src.thumbnail_cache import get_thumbnail_atlas
+from src.config_store import ConfigStore, SPLIT_CONFIG_KEYS
+from src.library_scanner import LibraryScanner, library_mtime
+from src.font_index import FontScanner, style_sort_key
 
 APP_VERSION = "1.4.0"
 CONFIG_FILE = "config.json"
 
-BIKE_DATA = [
-    ("YAMAHA YZ250F", "Y250"), ("YAMAHA YZ450F", "Y450"),
-    ("ALTA REDSHIFT MX", "E"), ("HONDA CR250R", "GRF250"),
-    ("HONDA CR450R", "GRF450"), ("SUZUKI RM-Z 250", "RM250"),
-    ("SUZUKI RM-Z 450", "RM450"), ("KAWASAKI KX250", "KW250"),
-    ("KAWASAKI KX450", "KW450"), ("KTM 250 SX-F", "KTSX250"),
-    ("KTM 450 SX-F", "KTSX450"), ("KTM 250 SX", "KTST250"),
-    ("TM 250Fi", "T250"), ("TM 450Fi", "T450")
-]
-
 def get_resource_path(filename):
     if getattr(sys, "frozen", False): base_dir = sys._MEIPASS
     else: base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -38,6 +36,8 @@ def get_resource_path(filename):
 
 class SoundCreatorFrame(ttk.Frame):
     name = "Sound Creator"
+    THUMBNAIL_POLL_MS = 30
+    BUILD_POLL_MS = 50 # How often build progress and buffered log lines are drained into the UI
 
     def __init__(self, parent, controller):
         super().__init__(parent)
@@ -50,22 +50,41 @@ class SoundCreatorFrame(ttk.Frame):
         self.new_mod_name_var = tk.StringVar(value="CustomName")
         self.bike_vars = {}
         self.bike_images = {}
-        self.placeholder_image = None
+        self.bike_buttons = {}
+        self.placeholder_images = {}
+        # Thumbnails are loaded on a worker thread and handed over through this queue
+        self._thumbnail_queue = queue.Queue()
+        self._thumbnail_generation = 0
+        self._thumbnails_pending = 0
         self.previewer = None
+        # Builds run on a worker thread; log lines and progress come back through these queues
+        self._log_queue = queue.Queue()
+        self._log_flush_id = None
+        self._build_events = queue.Queue()
+        self._build_thread = None
+        self._build_cancel = None
         self.engine_status_var = tk.StringVar(value="❌")
         self.idle_status_var = tk.StringVar(value="❌")
         self.low_status_var = tk.StringVar(value="❌")
         self.high_status_var = tk.StringVar(value="❌")
+        # (path var, status var, details var, waveform label, loop var) per sound row; files are inspected in the
+        # background. Only the looped sounds have a loop var (else None): their loop points are found too.
+        self.sound_rows = []
+        self.sound_inspector = None
+        self.loop_analyzer = None
+        trim_loops = self.controller.get_setting("trim_loops", [])
+        self.trim_loop_vars = {name: tk.BooleanVar(value=name in trim_loops) for name in ("engine", "idle")}
+        self.waveform_cache = None
+        self.waveform_images = {} # waveform label -> PhotoImage, kept referenced for Tk
+        self._waveform_sources = {} # waveform label -> (path, mtime_ns, size) it currently shows
         self.log_is_visible = tk.BooleanVar(value=False)
         self.include_engine_var = tk.BooleanVar(value=True)
         self.include_idle_var = tk.BooleanVar(value=True)
         self.include_low_var = tk.BooleanVar(value=True)
         self.include_high_var = tk.BooleanVar(value=True)
         self.build_ui()
-
-    def on_config_update(self):
-        self.populate_bikes_frame()
-        if self.previewer: self.previewer.on_config_update()
+        # Only a new thumbnail folder touches the bike grid, and then only its images
+        self.controller.subscribe("thumbnail_folder_path", self.refresh_bike_thumbnails)
 
     def build_ui(self):
         # Outer PanedWindow for Left vs (Center + Right)
@@ -85,7 +104,16 @@ class SoundCreatorFrame(ttk.Frame):
         self.setup_output_widgets(output_frame)
         self.create_button = ttk.Button(left_pane, text="Create Sound Mod Package", command=self.create_mod_package)
         self.create_button.pack(fill=X, pady=10, ipady=10)
-        log_container = ttk.Frame(left_pane)
+        # Shown only while a build runs
+        self.build_progress_frame = ttk.Frame(left_pane)
+        self.build_progress_frame.grid_columnconfigure(0, weight=1)
+        self.build_progress = ttk.Progressbar(self.build_progress_frame, mode="determinate", bootstyle="success-striped")
+        self.build_progress.grid(row=0, column=0, sticky='ew')
+        self.cancel_build_button = ttk.Button(self.build_progress_frame, text="Cancel", command=self.cancel_build, bootstyle="danger-outline")
+        self.cancel_build_button.grid(row=0, column=1, padx=(10, 0))
+        self.build_status_label = ttk.Label(self.build_progress_frame, text="")
+        self.build_status_label.grid(row=1, column=0, columnspan=2, sticky='w', pady=(2, 0))
+        log_container = self.log_container = ttk.Frame(left_pane)
         log_container.pack(fill=X, expand=True)
         self.log_is_visible = tk.BooleanVar(value=False)
         log_header = ttk.Checkbutton(log_container, text="Show Log", variable=self.log_is_visible, command=self.toggle_log, bootstyle="info-toolbutton")
@@ -97,7 +125,7 @@ class SoundCreatorFrame(ttk.Frame):
         main_pane.add(center_right_pane, weight=3) # Takes more space
 
         # --- CENTER PANE (Previewer) ---
-        self.previewer = ImagePreviewer(center_right_pane, self.controller, BIKE_DATA)
+        self.previewer = ImagePreviewer(center_right_pane, self.controller, BIKE_DATA, hold_rendering=True)
         center_right_pane.add(self.previewer, weight=1) # This pane WILL expand
 
         # --- RIGHT PANE (Bikes) ---
@@ -116,8 +144,8 @@ class SoundCreatorFrame(ttk.Frame):
         stop_button.grid(row=0, column=1, sticky='nsew', ipady=5, padx=(10, 0), pady=(0, 10))
         if platform.system() != "Windows": stop_button.config(state=tk.DISABLED)
         ttk.Separator(parent).pack(fill=X, pady=5)
-        self.create_sound_input_row(parent, "Engine:", self.engine_wav_var, self.engine_status_var, self.include_engine_var)
-        self.create_sound_input_row(parent, "Idle:", self.idle_wav_var, self.idle_status_var, self.include_idle_var)
+        self.create_sound_input_row(parent, "Engine:", self.engine_wav_var, self.engine_status_var, self.include_engine_var, self.trim_loop_vars["engine"])
+        self.create_sound_input_row(parent, "Idle:", self.idle_wav_var, self.idle_status_var, self.include_idle_var, self.trim_loop_vars["idle"])
         self.create_sound_input_row(parent, "Low:", self.low_wav_var, self.low_status_var, self.include_low_var)
         self.create_sound_input_row(parent, "High:", self.high_wav_var, self.high_status_var, self.include_high_var)
 
@@ -157,21 +185,66 @@ class SoundCreatorFrame(ttk.Frame):
         ttk.Button(button_bar, text="Deselect All", command=self.deselect_all_bikes, bootstyle="outline").pack(side=tk.LEFT, expand=True)
         bikes_scrolled_frame = ScrolledFrame(self.bikes_container_frame, autohide=True)
         bikes_scrolled_frame.pack(fill=BOTH, expand=True)
-        thumb_path = self.controller.get_setting("thumbnail_folder_path")
         cols = 2 # Adjusted for a narrower, vertical-friendly layout
+        self.bike_buttons = {}
         for i, (bike_name, bike_id) in enumerate(BIKE_DATA):
             var = tk.BooleanVar(value=(i == 0)); self.bike_vars[bike_id] = var
-            img_path = os.path.join(thumb_path, f"{bike_id}.png") if thumb_path else ""
-            image_to_display = self._get_bike_thumbnail(img_path, bike_id)
             button_text = f"{bike_name}\n{bike_id}"
             cb = ttk.Checkbutton(
-                bikes_scrolled_frame, image=image_to_display, text=button_text, variable=var,
-                compound=tk.TOP, bootstyle="primary-toolbutton",
+                bikes_scrolled_frame, text=button_text, variable=var, compound=tk.TOP, bootstyle="primary-toolbutton",
                 command=lambda bike_id=bike_id: self._on_bike_selection_change(bike_id)
             )
             cb.grid(row=i//cols, column=i%cols, padx=5, pady=5)
+            cb.config(image=self._get_placeholder_image((80, 50), "Loading..."))
+            self.bike_buttons[bike_id] = cb
         self._update_previewer()
 
+    def start_background_work(self):
+        # Called by App once the window is up: thumbnails and the first preview render
+        self.refresh_bike_thumbnails()
+        self.previewer.start_rendering()
+
+    def refresh_bike_thumbnails(self):
+        thumb_path = self.controller.get_setting("thumbnail_folder_path")
+        thumbnail_jobs = []
+        for bike_id, cb in self.bike_buttons.items():
+            img_path = os.path.join(thumb_path, f"{bike_id}.png") if thumb_path else ""
+            if img_path: thumbnail_jobs.append((bike_id, img_path))
+            cb.config(image=self._get_placeholder_image((80, 50), "Loading..." if img_path else "No Preview"))
+        self._start_thumbnail_loading(thumbnail_jobs)
+
+    def _start_thumbnail_loading(self, jobs):
+        # Placeholders are shown right away and swapped for the real thumbnails as the loader delivers them.
+        # A newer generation (the grid was rebuilt) makes an older loader stop and its results ignored.
+        self._thumbnail_generation += 1
+        self._thumbnails_pending = len(jobs)
+        if not jobs: return
+        threading.Thread(target=self._load_thumbnails, args=(self._thumbnail_generation, jobs), daemon=True).start()
+        self.after(self.THUMBNAIL_POLL_MS, self._drain_thumbnails)
+
+    def _load_thumbnails(self, generation, jobs):
+        # Runs on the loader thread: no Tk calls here, PhotoImages are created by _drain_thumbnails
+        atlas = get_thumbnail_atlas()
+        for bike_id, img_path in jobs:
+            if generation != self._thumbnail_generation: break
+            try: self._thumbnail_queue.put((generation, bike_id, atlas.get_thumbnail(img_path), None))
+            except Exception as e: self._thumbnail_queue.put((generation, bike_id, None, e))
+        try: atlas.save()
+        except OSError as e: print(f"Could not save the thumbnail cache: {e}")
+
+    def _drain_thumbnails(self):
+        while True:
+            try: generation, bike_id, img, error = self._thumbnail_queue.get_nowait()
+            except queue.Empty: break
+            if generation != self._thumbnail_generation: continue
+            self._thumbnails_pending -= 1
+            if img is not None:
+                self.bike_images[bike_id] = ImageTk.PhotoImage(img)
+                self.bike_buttons[bike_id].config(image=self.bike_images[bike_id])
+            else:
+                self.bike_buttons[bike_id].config(image=self._get_placeholder_image((80, 50), "Error" if error else "No Preview"))
+        if self._thumbnails_pending > 0: self.after(self.THUMBNAIL_POLL_MS, self._drain_thumbnails)
+
     def _on_bike_selection_change(self, changed_bike_id):
         var = self.bike_vars[changed_bike_id]
         if not var.get():
@@ -181,22 +254,16 @@ class SoundCreatorFrame(ttk.Frame):
                 messagebox.showinfo("Selection Required", "At least one bike must be selected at all times.", parent=self)
         self._update_previewer()
 
-    def _get_bike_thumbnail(self, img_path, bike_id):
-        if os.path.exists(img_path):
-            try:
-                img = Image.open(img_path); img.thumbnail((96, 96), Image.Resampling.LANCZOS)
-                self.bike_images[bike_id] = ImageTk.PhotoImage(img)
-                return self.bike_images[bike_id]
-            except Exception: return self._get_placeholder_image((80, 50), "Error")
-        else: return self._get_placeholder_image((80, 50), "No Preview")
-
     def _get_placeholder_image(self, size, text):
+        # Placeholders are shared between buttons and kept referenced so Tk doesn't drop them
+        if (size, text) in self.placeholder_images: return self.placeholder_images[(size, text)]
         img = Image.new('RGB', size, color=self.winfo_toplevel().style.colors.get('dark'))
         draw = ImageDraw.Draw(img)
         try: font = ImageFont.truetype("arial.ttf", 10)
         except IOError: font = ImageFont.load_default()
         draw.text((size[0]/2, size[1]/2), text, font=font, anchor="mm", fill=self.winfo_toplevel().style.colors.get('light'))
-        return ImageTk.PhotoImage(img)
+        self.placeholder_images[(size, text)] = ImageTk.PhotoImage(img)
+        return self.placeholder_images[(size, text)]
 
     def select_all_bikes(self):
         for var in self.bike_vars.values(): var.set(True)
@@ -236,10 +303,61 @@ class SoundCreatorFrame(ttk.Frame):
         self.update_all_statuses()
 
     def update_all_statuses(self):
-        self.engine_status_var.set("✔️" if self.engine_wav_var.get() else "❌"); self.idle_status_var.set("✔️" if self.idle_wav_var.get() else "❌")
-        self.low_status_var.set("✔️" if self.low_wav_var.get() else "❌"); self.high_status_var.set("✔️" if self.high_wav_var.get() else "❌")
-
-    def create_sound_input_row(self, parent, label_text, string_var, status_var, include_var):
+        for path_var, status_var, details_var, waveform_label, loop_var in self.sound_rows:
+            path = path_var.get()
+            self._update_waveform(waveform_label, path)
+            if loop_var is not None: loop_var.set("Finding loop points..." if path else "")
+            if not path: status_var.set("❌"); details_var.set(""); continue
+            status_var.set("⏳"); details_var.set("Inspecting...")
+            if self.sound_inspector is None:
+                from src.wav_inspector import WavInspector # Deferred: pulls in numpy
+                self.sound_inspector = WavInspector()
+            self.sound_inspector.inspect_async(path, lambda *result: self.controller.call_in_ui(self._show_sound_inspection, *result))
+            if loop_var is None: continue
+            if self.loop_analyzer is None:
+                from src.loop_points import LoopAnalyzer # Deferred: pulls in numpy
+                self.loop_analyzer = LoopAnalyzer()
+            self.loop_analyzer.analyze_async(path, lambda *result: self.controller.call_in_ui(self._show_loop_points, *result))
+
+    def _update_waveform(self, waveform_label, path):
+        # Redrawn only when the row's file (or its contents) changed since it was last drawn
+        try: st = os.stat(path) if path else None
+        except OSError: st = None
+        source = (path, st.st_mtime_ns, st.st_size) if st else None
+        if self._waveform_sources.get(waveform_label) == source: return
+        self._waveform_sources[waveform_label] = source
+        if source is None: waveform_label.config(image=''); self.waveform_images.pop(waveform_label, None); return
+        if self.waveform_cache is None:
+            from src.waveform_cache import WaveformCache # Deferred: pulls in numpy
+            self.waveform_cache = WaveformCache()
+        colors = self.winfo_toplevel().style.colors
+        self.waveform_cache.render_async(path, lambda *result: self.controller.call_in_ui(self._show_waveform, waveform_label, source, *result), color=colors.get('info'), background=colors.get('dark'))
+
+    def _show_waveform(self, waveform_label, source, path, image, error):
+        if self._waveform_sources.get(waveform_label) != source: return # Superseded by another file
+        if image is None: waveform_label.config(image=''); self.waveform_images.pop(waveform_label, None); return
+        self.waveform_images[waveform_label] = ImageTk.PhotoImage(image)
+        waveform_label.config(image=self.waveform_images[waveform_label])
+
+    def _show_sound_inspection(self, path, info, stats, error):
+        from src.wav_inspector import describe, warnings_for
+        for path_var, status_var, details_var, _, _ in self.sound_rows:
+            if path_var.get() != path: continue # Row changed to another file meanwhile
+            if error is not None: status_var.set("❌"); details_var.set(f"Unreadable WAV: {error}"); continue
+            warnings = warnings_for(info, stats)
+            status_var.set("⚠️" if warnings else "✔️")
+            details_var.set(describe(info, stats) + (f" · {', '.join(warnings).capitalize()}" if warnings else ""))
+
+    def _show_loop_points(self, path, loop, error):
+        from src.loop_points import describe_loop
+        for path_var, _, _, _, loop_var in self.sound_rows:
+            if loop_var is None or path_var.get() != path: continue
+            loop_var.set(f"No loop found: {error}" if error is not None else describe_loop(loop))
+
+    def _save_trim_loops(self):
+        self.controller.update_setting("trim_loops", [name for name, var in self.trim_loop_vars.items() if var.get()], broadcast=False)
+
+    def create_sound_input_row(self, parent, label_text, string_var, status_var, include_var, trim_var=None):
         row_frame = ttk.Frame(parent)
         row_frame.pack(fill=X, pady=2)
         row_frame.grid_columnconfigure(1, weight=1)
@@ -249,6 +367,20 @@ class SoundCreatorFrame(ttk.Frame):
         
         status_label = ttk.Label(row_frame, textvariable=status_var, width=2)
         status_label.grid(row=0, column=2, padx=5)
+        details_var = tk.StringVar()
+        ttk.Label(row_frame, textvariable=details_var, bootstyle="secondary", font=("TkDefaultFont", 8)).grid(row=1, column=1, columnspan=4, sticky=tk.W, padx=5)
+        waveform_label = ttk.Label(row_frame)
+        waveform_label.grid(row=2, column=1, columnspan=4, sticky=tk.W, padx=5)
+        loop_var = trim_checkbutton = None
+        if trim_var is not None:
+            # Looped sounds: where the loop points fall and how clean the seam is, and whether to trim to them
+            loop_frame = ttk.Frame(row_frame)
+            loop_frame.grid(row=3, column=1, columnspan=4, sticky=tk.W, padx=5)
+            trim_checkbutton = ttk.Checkbutton(loop_frame, text="Trim to loop", variable=trim_var, command=self._save_trim_loops, bootstyle="round-toggle")
+            trim_checkbutton.pack(side=tk.LEFT)
+            loop_var = tk.StringVar()
+            ttk.Label(loop_frame, textvariable=loop_var, bootstyle="secondary", font=("TkDefaultFont", 8)).pack(side=tk.LEFT, padx=(10, 0))
+        self.sound_rows.append((string_var, status_var, details_var, waveform_label, loop_var))
         
         browse_button = ttk.Button(row_frame, text="...", bootstyle="outline", width=4, command=lambda: self.browse_for_file(string_var, [("WAV", "*.wav")]))
         browse_button.grid(row=0, column=3)
@@ -264,6 +396,7 @@ class SoundCreatorFrame(ttk.Frame):
             entry.config(state="readonly" if is_enabled else tk.DISABLED)
             browse_button.config(state=new_state)
             status_label.config(state=new_state)
+            if trim_checkbutton is not None: trim_checkbutton.config(state=new_state)
             if platform.system() == "Windows":
                 play_button.config(state=new_state)
 
@@ -277,9 +410,13 @@ class SoundCreatorFrame(ttk.Frame):
         if file_path: string_var.set(file_path); self.update_all_statuses()
 
     def update_output_options(self, mod_data):
+        # Called again whenever a background scan finishes, so keep the user's library and mod if they still exist
         lib_paths = list(mod_data.keys()); lib_display_names = [os.path.basename(p) for p in lib_paths]
+        current = self.library_selector.get()
         self.library_selector['values'] = lib_display_names
-        if lib_display_names: self.library_selector.set(lib_display_names[0]); self.create_button.config(state=tk.NORMAL); self._on_library_select()
+        if lib_display_names:
+            self.library_selector.set(current if current in lib_display_names else lib_display_names[0])
+            self.create_button.config(state=tk.NORMAL); self._on_library_select()
         else: self.library_selector.set(''); self.create_button.config(state=tk.DISABLED)
         self._on_output_mode_change()
 
@@ -287,8 +424,9 @@ class SoundCreatorFrame(ttk.Frame):
         lib_name = self.library_selector.get(); full_path = self.controller.get_full_library_path(lib_name)
         if full_path:
             mod_folders = self.controller.get_mods_for_library(full_path)
+            current = self.existing_mod_selector.get() if event is None else ''
             self.existing_mod_selector['values'] = mod_folders
-            if mod_folders: self.existing_mod_selector.set(mod_folders[0])
+            if mod_folders: self.existing_mod_selector.set(current if current in mod_folders else mod_folders[0])
             else: self.existing_mod_selector.set('')
         self._update_previewer()
 
@@ -299,6 +437,7 @@ class SoundCreatorFrame(ttk.Frame):
         self._update_previewer()
 
     def create_mod_package(self):
+        if self._build_thread is not None: return
         self.log_is_visible.set(True); self.toggle_log()
         self.log("\n--- Starting Mod Creation Process ---")
         lib_name = self.library_selector.get()
@@ -321,6 +460,12 @@ class SoundCreatorFrame(ttk.Frame):
                 if not path or not os.path.exists(path):
                     messagebox.showerror("Validation Error", f"'{name.capitalize()}' sound is enabled, but the file is not selected or does not exist.", parent=self)
                     return
+                # Header only, so this stays instant even for long files
+                from src.wav_inspector import parse_wav_header, WavFormatError
+                try: parse_wav_header(path)
+                except (WavFormatError, OSError) as e:
+                    messagebox.showerror("Validation Error", f"'{name.capitalize()}' sound is not a valid WAV file ({e}).", parent=self)
+                    return
                 sound_paths[name] = path
 
         if not sound_paths:
@@ -329,28 +474,98 @@ class SoundCreatorFrame(ttk.Frame):
 
         selected_bikes = [bike_id for bike_id, var in self.bike_vars.items() if var.get()]
         if not selected_bikes: messagebox.showerror("Validation Error", "Please select at least one bike."); return
-        preview_elements = self.controller.get_setting("preview_elements", [])
-        success = create_sound_mod_package(
+        # Snapshot the settings: the build runs on a worker thread while the UI stays editable
+        build_args = dict(
             output_library_path=full_lib_path, mod_name=mod_name, selected_bikes=selected_bikes,
             sound_paths=sound_paths, thumbnail_folder=self.controller.get_setting("thumbnail_folder_path"),
-            preview_elements=preview_elements, bike_data=BIKE_DATA, log_callback=self.log
+            preview_elements=[dict(elem) for elem in self.controller.get_setting("preview_elements", [])], bike_data=BIKE_DATA,
+            workers=self.controller.get_setting("packaging_workers", 0), audio_settings=self.controller.get_setting("audio_processing"),
+            loop_sounds=[name for name, var in self.trim_loop_vars.items() if var.get()]
         )
-        if success:
-            self.log("\n--- Mod Creation Complete! ---")
-            messagebox.showinfo("Success", f"Mod '{mod_name}' created successfully in library '{lib_name}'.")
-        else:
-            self.log("\n--- Mod Creation Finished with Errors ---")
-            messagebox.showwarning("Process Finished", "Mod creation failed. Please check the log for details.")
-        self.controller.scan_all_libraries()
+        self._build_cancel = threading.Event()
+        self._build_thread = threading.Thread(target=self._run_build, args=(build_args, self._build_cancel), name="mod-build")
+        self.create_button.config(state=tk.DISABLED)
+        self.cancel_build_button.config(state=tk.NORMAL)
+        self.build_progress.config(maximum=len(selected_bikes), value=0)
+        self.build_status_label.config(text="Preparing build...")
+        self.build_progress_frame.pack(fill=X, pady=(0, 10), before=self.log_container)
+        # The library's mtime before the build, so the index only trusts the build's own change to it (see LibraryIndex.add_mod)
+        library_mtime_before = library_mtime(full_lib_path)
+        self._build_thread.start()
+        self.after(self.BUILD_POLL_MS, lambda: self._poll_build(lib_name, full_lib_path, mod_name, library_mtime_before))
+
+    def _run_build(self, build_args, cancel_event):
+        # Runs on the build thread: no Tk calls, everything goes through the queues
+        from src.packaging_sounds import create_sound_mod_package # Deferred: not needed until the first build
+        try:
+            success = create_sound_mod_package(
+                log_callback=self.log, progress_callback=lambda done, total, bike_id: self._build_events.put(("progress", done, total, bike_id)),
+                cancel_event=cancel_event, **build_args
+            )
+        except Exception as e: self.log(f"FATAL ERROR: {e}"); success = False
+        self._build_events.put(("done", success))
+
+    def cancel_build(self):
+        if self._build_cancel is None: return
+        self._build_cancel.set()
+        self.cancel_build_button.config(state=tk.DISABLED)
+        self.build_status_label.config(text="Cancelling after the bikes in progress...")
+
+    def _poll_build(self, lib_name, full_lib_path, mod_name, library_mtime_before):
+        result = None
+        while True:
+            try: event = self._build_events.get_nowait()
+            except queue.Empty: break
+            if event[0] == "progress":
+                _, done, total, bike_id = event
+                self.build_progress.config(maximum=total, value=done)
+                if not self._build_cancel.is_set(): self.build_status_label.config(text=f"Packaged {done} of {total} bike(s) - {bike_id}")
+            else: result = event[1]
+        self._flush_log()
+        if result is None:
+            self.after(self.BUILD_POLL_MS, lambda: self._poll_build(lib_name, full_lib_path, mod_name, library_mtime_before)); return
+        cancelled = self._build_cancel.is_set()
+        self._build_thread = self._build_cancel = None
+        self.build_progress_frame.pack_forget()
+        self.create_button.config(state=tk.NORMAL)
+        if result: self.log("\n--- Mod Creation Complete! ---")
+        elif cancelled: self.log("\n--- Mod Creation Cancelled ---")
+        else: self.log("\n--- Mod Creation Finished with Errors ---")
+        self._flush_log()
+        if result: messagebox.showinfo("Success", f"Mod '{mod_name}' created successfully in library '{lib_name}'.")
+        elif cancelled: messagebox.showinfo("Process Cancelled", "Mod creation was cancelled. Bikes already being packaged were finished and kept; no others were started. See the log for the bikes that were built.")
+        else: messagebox.showwarning("Process Finished", "Mod creation failed. Please check the log for details.")
+        # Only the mod folder this build wrote to can have appeared
+        self.controller.refresh_mod(full_lib_path, mod_name, library_mtime_before)
+
+    def shutdown_build(self):
+        # On exit: stop starting new bikes and wait for the ones in progress to be completed
+        if self._build_thread is None: return
+        self._build_cancel.set()
+        self._build_thread.join()
 
     def log(self, msg):
+        # Thread-safe. Lines are buffered and written to the widget in one go per UI tick.
+        self._log_queue.put(str(msg).strip())
+        if threading.current_thread() is threading.main_thread() and self._log_flush_id is None:
+            self._log_flush_id = self.after(self.BUILD_POLL_MS, self._flush_log)
+
+    def _flush_log(self):
+        if self._log_flush_id is not None: self.after_cancel(self._log_flush_id); self._log_flush_id = None
+        lines = []
+        while True:
+            try: lines.append(self._log_queue.get_nowait())
+            except queue.Empty: break
+        if not lines: return
         self.log_output_text.text.config(state='normal')
-        self.log_output_text.insert(tk.END, str(msg).strip() + "\n")
+        self.log_output_text.insert(tk.END, "\n".join(lines) + "\n")
         self.log_output_text.see(tk.END)
         self.log_output_text.text.config(state='disabled')
 
 
 class App(tk.Tk):
+    UI_POLL_MS = 50 # How often callbacks queued by worker threads are run on the Tk thread
+
     def __init__(self, themename="superhero"):
         super().__init__()
         self.style = ttk.Style(theme=themename)
@@ -360,12 +575,19 @@ class App(tk.Tk):
             icon_path = get_resource_path("smx_sound_creator.ico")
             if os.path.exists(icon_path): self.iconbitmap(icon_path)
         except Exception: pass
+        self.config_store = ConfigStore(CONFIG_FILE, SPLIT_CONFIG_KEYS)
+        self.config_store.attach(self)
         self.config = {}
+        self._subscribers = {}
+        self._ui_calls = queue.Queue()
+        # Created in _finish_startup, once the window is up, since both read their on-disk index
+        self.library_scanner = None
+        self.font_scanner = None
         self.mod_data = {}
-        self.fonts = {}
-        self.font_path_to_name = {}
+        self.fonts = {"Default (Arial)": "arial.ttf"}
+        self.font_path_to_name = {"arial.ttf": "Default (Arial)"}
         self.load_config()
-        self.scan_and_build_font_list()
+        startup_trace.mark("config loaded")
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
         self.nav_frame = ttk.Frame(self)
@@ -380,30 +602,49 @@ class App(tk.Tk):
         self.container.grid(row=1, column=0, sticky="nsew")
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
+        # Frames are built the first time they're shown
         self.frames = {}
-        for F in (SoundCreatorFrame, SettingsFrame):
-            frame = F(self.container, self)
-            self.frames[F.name] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
-        self.scan_all_libraries()
         self.show_frame("Sound Creator")
+        startup_trace.mark("main frame built")
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.after(self.UI_POLL_MS, self._run_ui_calls)
+        # Idle callbacks run in order, so this comes after Tk has mapped and drawn the window
+        self.after_idle(self._finish_startup)
+
+    def _finish_startup(self):
+        # Second startup stage: everything that reads the disk is started from here, in the background where it can be
+        startup_trace.mark("window shown")
+        self.library_scanner = LibraryScanner()
+        self.scan_all_libraries()
+        self.font_scanner = FontScanner()
+        self.scan_and_build_font_list()
+        self.frames["Sound Creator"].start_background_work()
+        startup_trace.mark("background work started")
+
+    def call_in_ui(self, callback, *args):
+        # Thread-safe: queue callback(*args) to run on the Tk thread
+        self._ui_calls.put((callback, args))
+
+    def _run_ui_calls(self):
+        # One failing callback is reported and skipped; the poll must keep running for every later result
+        while True:
+            try: callback, args = self._ui_calls.get_nowait()
+            except queue.Empty: break
+            try: callback(*args)
+            except Exception: traceback.print_exc()
+        self.after(self.UI_POLL_MS, self._run_ui_calls)
 
     def load_config(self):
-        try:
-            with open(CONFIG_FILE, 'r') as f: self.config = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError): self.config = {}
+        self.config = self.config_store.load()
         self.config.setdefault("library_paths", [])
         self.config.setdefault("thumbnail_folder_path", "")
         self.config.setdefault("font_folder_paths", [])
+        self.config.setdefault("packaging_workers", 0) # 0 = one worker process per CPU core
+        self.config.setdefault("high_quality_preview", False)
+        self.config.setdefault("trim_loops", []) # Looped sounds (engine, idle) trimmed to their detected loop points
 
         if "preview_elements" not in self.config:
-            self.config["preview_elements"] = [
-                {"id": str(uuid.uuid4()), "name": "Background", "type": "background", "visible": True, "path": "", "color": "#FFFFFF", "pos_x": 960, "pos_y": 540, "scale": 1.0, "rotation": 0, "aspect_ratio": "fit"},
-                {"id": str(uuid.uuid4()), "name": "Bike Image", "type": "bike_image", "visible": True, "pos_x": 960, "pos_y": 540, "scale": 0.85, "rotation": 0, "aspect_ratio": "fit"},
-                {"id": str(uuid.uuid4()), "name": "Bike ID", "type": "text", "visible": True, "dataSource": "Bike ID", "staticText": "", "font_path": "arial.ttf", "size": 80, "color": "#FFFFFF", "align": "center", "pos_x": 960, "pos_y": 80, "outline_size": 2, "outline_color": "#000000", "rotation": 0},
-                {"id": str(uuid.uuid4()), "name": "Mod Name", "type": "text", "visible": True, "dataSource": "Mod Name", "staticText": "", "font_path": "arial.ttf", "size": 70, "color": "#FFFFFF", "align": "center", "pos_x": 960, "pos_y": 1000, "outline_size": 2, "outline_color": "#000000", "rotation": 0}
-            ]
+            self.config["preview_elements"] = default_preview_elements()
         else: # Config Upgrader
             for elem in self.config["preview_elements"]:
                 if elem.get("type") in ["background", "bike_image", "image"]:
@@ -414,46 +655,74 @@ class App(tk.Tk):
                     elem.setdefault("scale", 1.0)
                 if elem.get("type") == "text":
                     elem.setdefault("rotation", 0)
+                    elem.setdefault("outline_shape", "square")
 
-    def save_config(self):
-        with open(CONFIG_FILE, 'w') as f: json.dump(self.config, f, indent=4)
+    def save_config(self, key=None):
+        # Written behind: rapid changes are coalesced into one atomic write shortly after the last one
+        self.config_store.mark_dirty(key)
     def get_setting(self, key, default=None): return self.config.get(key, default)
     def update_setting(self, key, value, broadcast=True):
         self.config[key] = value
-        self.save_config()
-        if broadcast: self.broadcast_config_update()
+        self.save_config(key)
+        if broadcast: self.notify(key)
+
+    def subscribe(self, keys, callback):
+        # callback() runs after any of the given settings changes; frames refresh only what depends on them
+        for key in ([keys] if isinstance(keys, str) else keys):
+            self._subscribers.setdefault(key, []).append(callback)
+
+    def unsubscribe(self, keys, callback):
+        for key in ([keys] if isinstance(keys, str) else keys):
+            if callback in self._subscribers.get(key, []): self._subscribers[key].remove(callback)
+
+    def notify(self, *keys):
+        # Each subscriber runs once, even if it listens to several of the changed keys
+        called = []
+        for key in keys:
+            for callback in self._subscribers.get(key, []):
+                if callback not in called: called.append(callback); callback()
 
-    def broadcast_config_update(self):
-        for frame in self.frames.values():
-            if hasattr(frame, 'on_config_update'): frame.on_config_update()
-            
     def update_library_paths(self, new_paths):
-        self.config["library_paths"] = new_paths; self.save_config(); self.scan_all_libraries()
+        self.config["library_paths"] = new_paths; self.save_config("library_paths"); self.scan_all_libraries()
+        self.notify("library_paths")
     def get_library_paths(self): return self.get_setting("library_paths", [])
     def get_full_library_path(self, name): return next((p for p in self.mod_data.keys() if os.path.basename(p) == name), None)
     def get_mods_for_library(self, full_path): return sorted(list(self.mod_data.get(full_path, {}).keys()))
     
     def scan_and_build_font_list(self):
-        self.fonts.clear()
-        self.font_path_to_name.clear()
-        self.fonts["Default (Arial)"] = "arial.ttf"
-        self.font_path_to_name["arial.ttf"] = "Default (Arial)"
+        # Fonts from the persisted index are available at once; the folders are rescanned in the
+        # background and "fonts" is notified when the list changes
         font_paths = self.get_setting("font_folder_paths", [])
-        for folder in font_paths:
-            if not os.path.isdir(folder): continue
-            for root, _, files in os.walk(folder):
-                for filename in files:
-                    if filename.lower().endswith(('.ttf', '.otf')):
-                        full_path = os.path.join(root, filename)
-                        display_name = os.path.splitext(filename)[0].replace('-', ' ').replace('_', ' ')
-                        if display_name in self.fonts:
-                            parent_folder = os.path.basename(os.path.dirname(full_path))
-                            display_name = f"{display_name} ({parent_folder})"
-                        self.fonts[display_name] = full_path
-                        self.font_path_to_name[full_path] = display_name
+        self._apply_font_list(self.font_scanner.cached(font_paths))
+        self.font_scanner.scan_async(font_paths, lambda fonts: self.call_in_ui(self._on_font_scan, fonts))
+
+    def _on_font_scan(self, fonts):
+        startup_trace.mark("fonts indexed")
+        self._apply_font_list(fonts)
+
+    def _apply_font_list(self, fonts):
+        # Named "Family Style" ("Family" for the regular face), grouped by family with the regular face first
+        names, path_to_name = {"Default (Arial)": "arial.ttf"}, {"arial.ttf": "Default (Arial)"}
+        for full_path, family, style in sorted(fonts, key=lambda f: (f[1].lower(), style_sort_key(f[2]), f[0])):
+            display_name = family if style in ("", "Regular") else f"{family} {style}"
+            if display_name in names: display_name = f"{display_name} ({os.path.basename(os.path.dirname(full_path))})"
+            if display_name in names: display_name = f"{display_name} [{os.path.basename(full_path)}]"
+            names[display_name] = full_path
+            path_to_name[full_path] = display_name
+        if names == self.fonts: return
+        self.fonts, self.font_path_to_name = names, path_to_name
+        self.notify("fonts")
 
     def get_font_names(self):
-        return sorted(list(self.fonts.keys()))
+        return list(self.fonts.keys())
+
+    def search_font_names(self, query):
+        # Faces whose name contains every word of the query, in the grouped order of get_font_names()
+        words = query.lower().split()
+        return [name for name in self.fonts if all(word in name.lower() for word in words)]
+
+    def has_font(self, font_name):
+        return font_name in self.fonts
 
     def get_font_path(self, font_name):
         return self.fonts.get(font_name, "arial.ttf")
@@ -463,32 +732,61 @@ class App(tk.Tk):
 
     def update_font_folder_paths(self, new_paths):
         self.config["font_folder_paths"] = new_paths
-        self.save_config()
+        self.save_config("font_folder_paths")
         self.scan_and_build_font_list()
-        self.broadcast_config_update()
+        self.notify("font_folder_paths")
         
     def scan_all_libraries(self):
-        self.mod_data.clear()
-        for lib_path in self.get_library_paths():
-            if os.path.isdir(lib_path):
-                self.mod_data[lib_path] = {}
-                for mod_folder in os.listdir(lib_path):
-                    if os.path.isdir(os.path.join(lib_path, mod_folder)): self.mod_data[lib_path][mod_folder] = []
+        # Show what the persisted index knew straight away, then rescan in the background;
+        # libraries whose folder mtime hasn't changed aren't listed again
+        library_paths = self.get_library_paths()
+        self._apply_library_scan(library_paths, self.library_scanner.cached(library_paths))
+        self.library_scanner.scan_async(library_paths, lambda result: self.call_in_ui(self._on_library_scan, library_paths, result))
+
+    def _on_library_scan(self, library_paths, result):
+        startup_trace.mark("libraries scanned")
+        self._apply_library_scan(library_paths, result)
+
+    def _apply_library_scan(self, library_paths, result):
+        self.mod_data = {path: {mod: [] for mod in result[path]} for path in library_paths if path in result}
+        sound_creator_frame = self.frames.get("Sound Creator")
+        if sound_creator_frame: sound_creator_frame.update_output_options(self.mod_data)
+
+    def refresh_mod(self, library_path, mod_name, mtime_before=None):
+        # After a build: pick up the (possibly new) mod folder without rescanning every library
+        mods = self.library_scanner.refresh_mod(library_path, mod_name, mtime_before)
+        if mods is None: return
+        self.mod_data[library_path] = {mod: [] for mod in mods}
         sound_creator_frame = self.frames.get("Sound Creator")
         if sound_creator_frame: sound_creator_frame.update_output_options(self.mod_data)
         
+    def _frame_class(self, page_name):
+        if page_name == "Settings":
+            from src.settings_ui import SettingsFrame # Deferred: only needed once Settings is opened
+            return SettingsFrame
+        return SoundCreatorFrame
+
     def show_frame(self, page_name):
-        if page_name in self.frames:
+        if page_name in self.nav_buttons:
+            if page_name not in self.frames:
+                frame = self._frame_class(page_name)(self.container, self)
+                frame.grid(row=0, column=0, sticky="nsew")
+                self.frames[page_name] = frame
             frame = self.frames[page_name]; frame.tkraise()
             for name, btn in self.nav_buttons.items():
                 btn.config(bootstyle="primary" if name == page_name else "secondary")
                 
     def on_closing(self):
         if platform.system() == "Windows": winsound.PlaySound(None, winsound.SND_PURGE)
-        self.save_config()
+        sound_creator_frame = self.frames.get("Sound Creator")
+        if sound_creator_frame: sound_creator_frame.shutdown_build()
+        # Write out any settings still waiting for the debounced save
+        try: self.config_store.flush()
+        except OSError as e: print(f"Could not save the configuration: {e}")
         self.destroy()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Required for the packaging process pool in frozen builds
     if not os.path.exists("src"): os.makedirs("src")
     app = App()
     app.mainloop()
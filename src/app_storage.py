@@ -0,0 +1,47 @@
+# --- Filename: src/app_storage.py ---
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+APP_DIR_NAME = "SMXSoundCreator"
+HASH_READ_CHUNK = 1024 * 1024
+
+def user_cache_dir(*parts):
+    # Per-user folder for rebuildable caches (thumbnails, indexes, ...); SMX_CACHE_DIR overrides it.
+    # Created on demand.
+    base = os.environ.get("SMX_CACHE_DIR")
+    if not base:
+        if sys.platform == "win32": base = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), APP_DIR_NAME, "cache")
+        elif sys.platform == "darwin": base = os.path.join(os.path.expanduser("~/Library/Caches"), APP_DIR_NAME)
+        else: base = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), APP_DIR_NAME)
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def atomic_write(path, data, mode='wb'):
+    # Write to a temp file next to the target and rename it into place, so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + "-", suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, mode) as f: f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+def atomic_write_json(path, data):
+    atomic_write(path, json.dumps(data, indent=4), mode='w')
+
+def read_json(path, default=None):
+    try:
+        with open(path, 'r') as f: return json.load(f)
+    except (OSError, json.JSONDecodeError): return default
+
+def hash_file(path):
+    # sha256 hex digest of a file's contents, read in chunks
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_READ_CHUNK), b""): digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,191 @@
+# --- Filename: src/audio_processing.py ---
+# Optional conversion of the sound files before they are zipped: sample rate, bit depth, channel
+# count, DC removal and peak/RMS normalisation. Audio is streamed through in chunks (two short
+# analysis passes when DC removal or normalisation need the whole file's levels, then the
+# conversion), so memory stays bounded for any length. Converted files are cached by the input's
+# content hash and the settings, so every bike and every later build reuses one conversion.
+import os
+import json
+import struct
+import hashlib
+import threading
+import numpy as np
+
+from src.app_storage import user_cache_dir, hash_file
+from src.wav_inspector import parse_wav_header, iter_float_chunks, CHUNK_FRAMES, WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT
+
+PROCESSING_VERSION = 1
+# sample_rate / bit_depth / channels of 0 keep the source's; bit_depth 32 is 32-bit float.
+# normalize is "none", "peak" or "rms", to target_db dBFS.
+DEFAULT_AUDIO_SETTINGS = {"enabled": False, "sample_rate": 0, "bit_depth": 0, "channels": 0, "normalize": "none", "target_db": -1.0, "remove_dc": False}
+SAMPLE_RATES = (22050, 32000, 44100, 48000)
+BIT_DEPTHS = (16, 24, 32)
+FILTER_TAPS = 63
+
+def active_audio_settings(settings):
+    # The complete settings when processing is enabled and would change anything, else None
+    merged = dict(DEFAULT_AUDIO_SETTINGS)
+    merged.update(settings or {})
+    if not merged["enabled"]: return None
+    merged["sample_rate"], merged["bit_depth"], merged["channels"] = int(merged["sample_rate"]), int(merged["bit_depth"]), int(merged["channels"])
+    merged["target_db"], merged["remove_dc"] = float(merged["target_db"]), bool(merged["remove_dc"])
+    if merged["normalize"] not in ("none", "peak", "rms"): raise ValueError(f"unknown normalisation '{merged['normalize']}'")
+    if merged["bit_depth"] not in (0,) + BIT_DEPTHS: raise ValueError(f"unsupported bit depth {merged['bit_depth']}")
+    if merged["sample_rate"] < 0 or merged["channels"] not in (0, 1, 2): raise ValueError("invalid sample rate or channel count")
+    if not (merged["sample_rate"] or merged["bit_depth"] or merged["channels"] or merged["remove_dc"] or merged["normalize"] != "none"): return None
+    return merged
+
+def describe_settings(settings):
+    parts = []
+    if settings["sample_rate"]: parts.append(f"{settings['sample_rate']} Hz")
+    if settings["bit_depth"]: parts.append("32-bit float" if settings["bit_depth"] == 32 else f"{settings['bit_depth']}-bit")
+    if settings["channels"]: parts.append("mono" if settings["channels"] == 1 else "stereo")
+    if settings["remove_dc"]: parts.append("DC removed")
+    if settings["normalize"] != "none": parts.append(f"{settings['normalize']} {settings['target_db']:g} dBFS")
+    return ", ".join(parts)
+
+def _mix(x, channels):
+    # (frames, source channels) -> (frames, channels): mono is the mean, stereo from mono duplicates it
+    if x.shape[1] == channels: return x
+    if channels == 1: return x.mean(axis=1, keepdims=True)
+    if x.shape[1] == 1: return np.repeat(x, channels, axis=1)
+    return x[:, :channels]
+
+def _output_bits(info, bit_depth):
+    if bit_depth: return bit_depth
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT: return 32
+    return 24 if info.bits_per_sample > 16 else 16
+
+def _lowpass_taps(cutoff):
+    # Blackman-windowed sinc; cutoff as a fraction of the input sample rate
+    n = np.arange(FILTER_TAPS) - (FILTER_TAPS - 1) / 2.0
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.blackman(FILTER_TAPS)
+    return taps / taps.sum()
+
+class StreamResampler:
+    # Linear interpolation between input frames, fed chunk by chunk. When downsampling the input first
+    # goes through a low-pass FIR (cutoff just below the new Nyquist) so high frequencies don't alias;
+    # its delay is compensated, so output frame k always lands at input time k * src_rate / dst_rate.
+    def __init__(self, src_rate, dst_rate, channels, total_frames):
+        self.step = src_rate / dst_rate
+        self.total_out = int((total_frames - 1) / self.step) + 1 if total_frames else 0
+        self.next_out = 0
+        self.consumed = 0 # Input frames (after filtering) seen so far
+        self.tail = np.zeros((0, channels))
+        self.taps = _lowpass_taps(0.45 * dst_rate / src_rate) if dst_rate < src_rate else None
+        self.history = np.zeros((FILTER_TAPS - 1, channels))
+        self.delay_left = (FILTER_TAPS - 1) // 2
+
+    def _filter(self, x):
+        padded = np.concatenate([self.history, x])
+        self.history = padded[len(padded) - (FILTER_TAPS - 1):]
+        y = np.stack([np.convolve(padded[:, c], self.taps, mode='valid') for c in range(x.shape[1])], axis=1)
+        skip = min(self.delay_left, len(y)); self.delay_left -= skip
+        return y[skip:]
+
+    def process(self, x, final=False):
+        if self.taps is not None:
+            y = self._filter(x)
+            # Flush the filter's delay with silence so the last input frames come out too
+            if final: y = np.concatenate([y, self._filter(np.zeros(((FILTER_TAPS - 1) // 2, x.shape[1])))])
+        else: y = x
+        buffer = np.concatenate([self.tail, y])
+        buffer_start = self.consumed - len(self.tail)
+        self.consumed += len(y)
+        if len(buffer) == 0: return buffer
+        # Output frames whose two neighbouring input frames are both available (all of them at the end)
+        last_out = self.total_out - 1 if final else min(self.total_out - 1, int((self.consumed - 2) / self.step) if self.consumed >= 2 else -1)
+        positions = np.arange(self.next_out, last_out + 1) * self.step
+        self.next_out = last_out + 1
+        self.tail = buffer[-2:] # positions between the last two frames are still to come
+        if len(positions) == 0: return np.zeros((0, buffer.shape[1]))
+        index = np.floor(positions).astype(np.int64) - buffer_start
+        frac = (positions - np.floor(positions))[:, None]
+        left = buffer[np.clip(index, 0, len(buffer) - 1)]
+        right = buffer[np.clip(index + 1, 0, len(buffer) - 1)]
+        return left + (right - left) * frac
+
+def _encode(x, bits):
+    # Interleaved little-endian sample bytes
+    if bits == 32: return x.astype("<f4").tobytes()
+    if bits == 16: return np.clip(np.round(x * 32767.0), -32768, 32767).astype("<i2").tobytes()
+    ints = np.clip(np.round(x * 8388607.0), -8388608, 8388607).astype("<i4")
+    return ints.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+def write_wav_header(f, channels, sample_rate, bits, frames, format_tag=None):
+    # format_tag defaults to float for 32-bit and PCM otherwise, as _encode writes them
+    block_align = channels * bits // 8
+    data_size = frames * block_align
+    if format_tag is None: format_tag = WAVE_FORMAT_IEEE_FLOAT if bits == 32 else WAVE_FORMAT_PCM
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        # Float WAVs carry an extended fmt chunk and a fact chunk
+        fmt = struct.pack("<HHIIHHH", WAVE_FORMAT_IEEE_FLOAT, channels, sample_rate, sample_rate * block_align, block_align, bits, 0)
+        extra = b"fact" + struct.pack("<II", 4, frames)
+    else:
+        fmt = struct.pack("<HHIIHH", WAVE_FORMAT_PCM, channels, sample_rate, sample_rate * block_align, block_align, bits)
+        extra = b""
+    riff_size = 4 + 8 + len(fmt) + len(extra) + 8 + data_size + data_size % 2
+    f.write(b"RIFF" + struct.pack("<I", riff_size) + b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + extra + b"data" + struct.pack("<I", data_size))
+
+def _converted_chunks(src_path, info, dc, channels, sample_rate, chunk_frames):
+    # The DC-free, remixed and resampled signal, chunk by chunk, before any gain
+    resampler = StreamResampler(info.sample_rate, sample_rate, channels, info.frames) if sample_rate != info.sample_rate else None
+    chunks = iter_float_chunks(src_path, info, chunk_frames)
+    current = next(chunks, None)
+    while current is not None:
+        following = next(chunks, None)
+        out = _mix(current[1] - dc, channels)
+        yield resampler.process(out, final=following is None) if resampler else out
+        current = following
+
+def convert_wav(src_path, dst_path, settings, chunk_frames=CHUNK_FRAMES):
+    info = parse_wav_header(src_path)
+    channels = settings["channels"] or info.channels
+    sample_rate = settings["sample_rate"] or info.sample_rate
+    bits = _output_bits(info, settings["bit_depth"])
+    # Pass 1: per-channel DC offset of the source
+    dc = np.zeros(info.channels)
+    if settings["remove_dc"] and info.frames:
+        for _, chunk in iter_float_chunks(src_path, info, chunk_frames): dc += chunk.sum(axis=0)
+        dc /= info.frames
+    # Pass 2: level of the converted signal (resampling filters out content, so it's measured after)
+    gain = 1.0
+    if settings["normalize"] != "none" and info.frames:
+        peak, total_sq, count = 0.0, 0.0, 0
+        for out in _converted_chunks(src_path, info, dc, channels, sample_rate, chunk_frames):
+            if not out.size: continue
+            peak = max(peak, float(np.max(np.abs(out))))
+            total_sq += float(np.sum(out * out)); count += out.size
+        level = peak if settings["normalize"] == "peak" else (total_sq / max(count, 1)) ** 0.5
+        if level > 0: gain = 10 ** (settings["target_db"] / 20.0) / level
+    # Pass 3: convert and write. Loud RMS targets can push peaks past full scale; _encode clips them.
+    frames_written = 0
+    with open(dst_path, 'wb') as f:
+        write_wav_header(f, channels, sample_rate, bits, 0)
+        for out in _converted_chunks(src_path, info, dc, channels, sample_rate, chunk_frames):
+            f.write(_encode(out * gain, bits))
+            frames_written += len(out)
+        if (frames_written * channels * bits // 8) % 2: f.write(b"\0")
+        f.seek(0)
+        write_wav_header(f, channels, sample_rate, bits, frames_written)
+
+class AudioProcessor:
+    # Converted files live in a per-user cache folder, named after the input's content hash and the
+    # settings, and are written to a temp file and renamed into place, so concurrent builds are safe
+    def __init__(self, folder=None):
+        self.folder = folder or user_cache_dir("processed_audio")
+
+    def process(self, path, settings):
+        # Path of the converted copy of path; raises WavFormatError / OSError
+        key = json.dumps({"version": PROCESSING_VERSION, "input": hash_file(path), "settings": settings}, sort_keys=True)
+        cache_path = os.path.join(self.folder, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".wav")
+        if os.path.exists(cache_path): return cache_path
+        tmp_path = f"{cache_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            convert_wav(path, tmp_path, settings)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        return cache_path
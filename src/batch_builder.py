@@ -0,0 +1,189 @@
+# --- Filename: src/batch_builder.py ---
+# Headless batch builds: runs create_sound_mod_package for every mod listed in a JSON job file,
+# without tkinter/ttkbootstrap, so builds can run on a render box or from scripts.
+#
+#   python -m src.batch_builder jobs.json [--parallel 2] [--workers 0] [--summary summary.json]
+#
+# Job file:
+#   {
+#     "config": "config.json",            optional; mods borrow missing settings from it
+#     "parallel": 2,                       optional; mods built at the same time
+#     "workers": 1,                        optional; worker processes per mod (0 = one per core)
+#     "mods": [
+#       {
+#         "name": "My Sound",
+#         "library": "D:/mods/sounds/4-Strokes",   a folder, or the name of a library in the config
+#         "sounds": {"engine": "engine.wav", "idle": "idle.wav", "low": "low.wav", "high": "high.wav"},
+#         "bikes": ["Y250", "Y450"],               or "all"; defaults to all
+#         "thumbnail_folder": "thumbs",            optional when a config provides it
+#         "preview_elements": [...],               optional when a config provides it
+#         "config": "other_config.json",           optional per-mod override of the job config
+#         "audio_processing": {...},               optional; defaults to the config's (see src/audio_processing.py)
+#         "trim_loops": ["engine", "idle"],        optional; defaults to the config's (see src/loop_points.py)
+#         "incremental": true                      optional; false forces a full rebuild
+#       }
+#     ]
+#   }
+#
+# Relative paths are resolved against the job file's folder. A mod entry that can't be built
+# (missing library, unknown bike, ...) is reported as failed without stopping the others. Prints
+# a JSON summary on stdout (or to --summary) and exits 0 when every mod built cleanly, 1 when any
+# mod failed and 2 when the job file itself is unreadable or malformed.
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.bike_data import BIKE_DATA
+from src.packaging_sounds import create_sound_mod_package, LOOP_SOUNDS
+from src.preview_rendering import default_preview_elements
+from src.config_store import load_config_file, SPLIT_CONFIG_KEYS
+
+SOUND_NAMES = ("engine", "idle", "low", "high")
+EXIT_OK, EXIT_BUILD_FAILED, EXIT_BAD_JOB = 0, 1, 2
+
+class JobError(Exception):
+    pass
+
+def _resolve(base_dir, path):
+    if not path: return path
+    path = os.path.expanduser(path)
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(base_dir, path))
+
+def _load_config(path, cache):
+    if path not in cache:
+        try:
+            cache[path] = load_config_file(path, SPLIT_CONFIG_KEYS)
+        except (OSError, json.JSONDecodeError) as e: raise JobError(f"Cannot read config '{path}': {e}")
+    return cache[path]
+
+def resolve_mod_job(mod, index, base_dir, job_config_path, config_cache):
+    # Turns one raw "mods" entry into create_sound_mod_package arguments, raising JobError if it can't be built
+    if not isinstance(mod, dict): raise JobError(f"mods[{index}] must be an object")
+    name = str(mod.get("name", "")).strip()
+    if not name: raise JobError(f"mods[{index}] has no name")
+
+    config_path = _resolve(base_dir, mod.get("config")) or job_config_path
+    config = _load_config(config_path, config_cache) if config_path else {}
+
+    library = mod.get("library")
+    if not library: raise JobError(f"'{name}': no library given")
+    library_path = _resolve(base_dir, library)
+    if not os.path.isdir(library_path):
+        # Like the UI, a library may be referred to by the folder name of a configured library
+        library_path = next((p for p in config.get("library_paths", []) if os.path.basename(p) == library), None)
+        if not library_path or not os.path.isdir(library_path): raise JobError(f"'{name}': library '{library}' not found")
+
+    sounds = mod.get("sounds") or {}
+    unknown = [s for s in sounds if s not in SOUND_NAMES]
+    if unknown: raise JobError(f"'{name}': unknown sound(s) {unknown}; expected {list(SOUND_NAMES)}")
+    sound_paths = {s: _resolve(base_dir, p) for s, p in sounds.items() if p}
+    if not sound_paths: raise JobError(f"'{name}': at least one sound is required")
+    missing = [p for p in sound_paths.values() if not os.path.isfile(p)]
+    if missing: raise JobError(f"'{name}': sound file(s) not found: {missing}")
+    trim_loops = list(mod.get("trim_loops", config.get("trim_loops")) or [])
+    unknown = [s for s in trim_loops if s not in LOOP_SOUNDS]
+    if unknown: raise JobError(f"'{name}': can't trim {unknown} to a loop; expected some of {list(LOOP_SOUNDS)}")
+
+    known_bikes = [bike_id for _, bike_id in BIKE_DATA]
+    bikes = mod.get("bikes", "all")
+    if bikes == "all": bikes = known_bikes
+    elif not isinstance(bikes, list): raise JobError(f"'{name}': 'bikes' must be a list of bike ids or \"all\", not {type(bikes).__name__}")
+    unknown = [b for b in bikes if b not in known_bikes]
+    if unknown: raise JobError(f"'{name}': unknown bike id(s) {unknown}")
+    if not bikes: raise JobError(f"'{name}': no bikes selected")
+
+    thumbnail_folder = _resolve(base_dir, mod["thumbnail_folder"]) if mod.get("thumbnail_folder") else config.get("thumbnail_folder_path", "")
+    preview_elements = mod.get("preview_elements") or config.get("preview_elements") or default_preview_elements()
+
+    return {
+        "output_library_path": library_path, "mod_name": name, "selected_bikes": bikes,
+        "sound_paths": sound_paths, "thumbnail_folder": thumbnail_folder,
+        "preview_elements": preview_elements, "bike_data": BIKE_DATA,
+        "incremental": bool(mod.get("incremental", True)),
+        "audio_settings": mod.get("audio_processing", config.get("audio_processing")),
+        "loop_sounds": trim_loops,
+    }
+
+def load_job_file(job_path):
+    try:
+        with open(job_path, 'r') as f: job = json.load(f)
+    except (OSError, json.JSONDecodeError) as e: raise JobError(f"Cannot read job file '{job_path}': {e}")
+    if not isinstance(job, dict) or not isinstance(job.get("mods"), list) or not job["mods"]:
+        raise JobError("Job file must be an object with a non-empty 'mods' list")
+    for key, minimum in (("parallel", 1), ("workers", 0)):
+        value = job.get(key, 1)
+        if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+            raise JobError(f"'{key}' must be a whole number of at least {minimum}, not {value!r}")
+    base_dir = os.path.dirname(os.path.abspath(job_path))
+    job_config_path = _resolve(base_dir, job.get("config"))
+    config_cache = {}
+    # Mods that can't be built become failed summary entries, keyed by their position in the job
+    mod_jobs, invalid = [], {}
+    for i, mod in enumerate(job["mods"]):
+        try: mod_jobs.append(resolve_mod_job(mod, i, base_dir, job_config_path, config_cache))
+        except (JobError, TypeError, ValueError, AttributeError) as e: invalid[i] = _invalid_mod_result(mod, i, e) # Wrong value types too
+    return job, mod_jobs, invalid
+
+def _invalid_mod_result(mod, index, error):
+    name = str(mod.get("name", "")).strip() if isinstance(mod, dict) else ""
+    return {
+        "name": name or f"mods[{index}]", "library": mod.get("library") if isinstance(mod, dict) else None, "bikes": [],
+        "success": False, "seconds": 0.0, "errors": [f"Invalid mod entry: {error}"],
+    }
+
+def run_jobs(mod_jobs, parallel=1, workers=1, log=None):
+    print_lock = threading.Lock()
+    def build(mod_job):
+        name, lines = mod_job["mod_name"], []
+        def log_callback(msg):
+            lines.append(str(msg).strip())
+            if log:
+                with print_lock: log(f"[{name}] {str(msg).strip()}")
+        start = time.perf_counter()
+        try: success = create_sound_mod_package(log_callback=log_callback, workers=workers, **mod_job)
+        except Exception as e: log_callback(f"FATAL ERROR: {e}"); success = False
+        return {
+            "name": name, "library": mod_job["output_library_path"], "bikes": mod_job["selected_bikes"],
+            "success": success, "seconds": round(time.perf_counter() - start, 3),
+            "errors": [line for line in lines if "ERROR" in line],
+        }
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        return list(pool.map(build, mod_jobs))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.batch_builder", description="Build SMX sound mods from a JSON job file without the UI.")
+    parser.add_argument("job_file", help="JSON job file listing the mods to build")
+    parser.add_argument("--parallel", type=int, help="Mods to build concurrently (overrides the job file)")
+    parser.add_argument("--workers", type=int, help="Worker processes per mod, 0 = one per core (overrides the job file)")
+    parser.add_argument("--summary", help="Write the JSON summary to this file instead of stdout")
+    parser.add_argument("--quiet", action="store_true", help="Don't stream build logs to stderr")
+    args = parser.parse_args(argv)
+
+    try: job, mod_jobs, invalid = load_job_file(args.job_file)
+    except JobError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return EXIT_BAD_JOB
+    parallel = args.parallel if args.parallel is not None else job.get("parallel", 1)
+    workers = args.workers if args.workers is not None else job.get("workers", 1)
+
+    for result in invalid.values(): print(f"ERROR: [{result['name']}] {result['errors'][0]}", file=sys.stderr)
+    start = time.perf_counter()
+    built = iter(run_jobs(mod_jobs, parallel, workers, log=None if args.quiet else lambda line: print(line, file=sys.stderr)))
+    results = [invalid[i] if i in invalid else next(built) for i in range(len(job["mods"]))]
+    summary = {
+        "success": all(r["success"] for r in results),
+        "built": sum(r["success"] for r in results), "failed": sum(not r["success"] for r in results),
+        "seconds": round(time.perf_counter() - start, 3), "mods": results,
+    }
+    if args.summary:
+        with open(args.summary, 'w') as f: json.dump(summary, f, indent=4)
+    else:
+        print(json.dumps(summary, indent=4))
+    return EXIT_OK if summary["success"] else EXIT_BUILD_FAILED
+
+if __name__ == "__main__":
+    sys.exit(main())
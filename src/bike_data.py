@@ -0,0 +1,11 @@
+# --- Filename: src/bike_data.py ---
+# (display name, bike id) for every stock bike; the id is the thumbnail file name and the zip folder name
+BIKE_DATA = [
+    ("YAMAHA YZ250F", "Y250"), ("YAMAHA YZ450F", "Y450"),
+    ("ALTA REDSHIFT MX", "E"), ("HONDA CR250R", "GRF250"),
+    ("HONDA CR450R", "GRF450"), ("SUZUKI RM-Z 250", "RM250"),
+    ("SUZUKI RM-Z 450", "RM450"), ("KAWASAKI KX250", "KW250"),
+    ("KAWASAKI KX450", "KW450"), ("KTM 250 SX-F", "KTSX250"),
+    ("KTM 450 SX-F", "KTSX450"), ("KTM 250 SX", "KTST250"),
+    ("TM 250Fi", "T250"), ("TM 450Fi", "T450")
+]
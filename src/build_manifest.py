@@ -0,0 +1,79 @@
+# --- Filename: src/build_manifest.py ---
+import os
+import json
+import hashlib
+
+from src.app_storage import atomic_write_json, read_json, hash_file
+
+MANIFEST_FILENAME = ".smx_build_manifest.json"
+MANIFEST_VERSION = 1
+# Bump whenever a change to the renderer or the archive layout alters the output for the same inputs
+RENDERER_VERSION = 1
+
+class BuildManifest:
+    # Per-mod record of what each bike's zip/png was built from. A bike whose fingerprint
+    # (content hashes of every input plus the scene and mod name) matches the last build,
+    # and whose outputs still exist, is skipped. File hashes are remembered by
+    # (mtime, size) so unchanged inputs aren't re-read on every build.
+    def __init__(self, mod_path):
+        self.path = os.path.join(mod_path, MANIFEST_FILENAME)
+        self.bikes = {}
+        self.files = {}
+        self._used_files = set()
+        data = read_json(self.path, {})
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.bikes = data.get("bikes", {})
+            self.files = data.get("files", {})
+
+    def file_hash(self, path):
+        try: st = os.stat(path)
+        except (OSError, TypeError, ValueError): return None
+        if not os.path.isfile(path): return None
+        abs_path = os.path.abspath(path)
+        self._used_files.add(abs_path)
+        cached = self.files.get(abs_path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size: return cached[2]
+        digest = hash_file(path)
+        self.files[abs_path] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def bike_fingerprint(self, bike_id, mod_name, sound_paths, thumbnail_folder, preview_elements, bike_data, audio_settings=None, loop_sounds=None):
+        layers = [elem for elem in preview_elements if elem.get("visible", True)]
+        assets = {}
+        for elem in layers:
+            elem_type = elem.get("type")
+            if elem_type in ("background", "image") and elem.get("path"): paths = [elem.get("path")]
+            elif elem_type == "bike_image": paths = [os.path.join(thumbnail_folder or "", f"{bike_id}.png")]
+            elif elem_type == "text": paths = [elem.get("font_path", "arial.ttf")]
+            else: paths = []
+            # Unresolvable entries (e.g. a font found by name, a missing image) are recorded by path alone
+            for path in paths: assets[str(path)] = self.file_hash(path)
+        payload = {
+            "renderer": RENDERER_VERSION,
+            "mod_name": mod_name,
+            "bike_id": bike_id,
+            "bike_name": next((name for name, b_id in bike_data if b_id == bike_id), bike_id),
+            "sounds": {name: [os.path.basename(path), self.file_hash(path)] for name, path in sound_paths.items()},
+            "elements": layers,
+            "assets": assets,
+        }
+        # Only present when the sounds are converted or trimmed, so existing fingerprints stay valid
+        if audio_settings: payload["audio"] = audio_settings
+        if loop_sounds: payload["loops"] = sorted(loop_sounds)
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def is_up_to_date(self, bike_id, fingerprint, output_paths):
+        entry = self.bikes.get(bike_id)
+        return bool(entry) and entry.get("fingerprint") == fingerprint and all(os.path.exists(p) for p in output_paths)
+
+    def record(self, bike_id, fingerprint, output_paths):
+        self.bikes[bike_id] = {"fingerprint": fingerprint, "outputs": [os.path.basename(p) for p in output_paths]}
+
+    def forget(self, bike_id):
+        self.bikes.pop(bike_id, None)
+
+    def save(self):
+        # Written atomically so an interrupted build never leaves a truncated manifest
+        # Only hashes of inputs seen in this build are kept, so renamed or removed files don't pile up
+        files = {path: entry for path, entry in self.files.items() if path in self._used_files}
+        atomic_write_json(self.path, {"version": MANIFEST_VERSION, "bikes": self.bikes, "files": files})
@@ -0,0 +1,80 @@
+# --- Filename: src/config_store.py ---
+import os
+import json
+
+from src.app_storage import atomic_write_json
+
+SAVE_DELAY_MS = 750
+# Settings kept in their own file beside the main config (config.json -> config.preview_elements.json)
+SPLIT_CONFIG_KEYS = ("preview_elements",)
+
+def split_file_path(config_path, key):
+    # e.g. config.json -> config.preview_elements.json
+    base, ext = os.path.splitext(config_path)
+    return f"{base}.{key}{ext or '.json'}"
+
+def load_config_file(config_path, split_keys=()):
+    # Reads a config and any split-out keys stored beside it. A key still embedded in the main file
+    # (a config written before it was split) is used when its own file doesn't exist yet.
+    # Raises OSError / json.JSONDecodeError like json.load for an unreadable main file.
+    with open(config_path, 'r') as f: data = json.load(f)
+    if not isinstance(data, dict): data = {}
+    for key in split_keys:
+        path = split_file_path(config_path, key)
+        if os.path.exists(path):
+            with open(path, 'r') as f: data[key] = json.load(f)
+    return data
+
+class ConfigStore:
+    # Write-behind persistence for the app config. Changes are marked dirty and written together
+    # once no further change has arrived for save_delay_ms; flush() writes immediately (on exit).
+    # Every file is replaced atomically, so a crash mid-save leaves the previous version intact.
+    # Keys in split_keys (the large preview_elements list) live in their own file beside the main
+    # one, so changing a small setting doesn't rewrite them and vice versa.
+    def __init__(self, path, split_keys=(), save_delay_ms=SAVE_DELAY_MS):
+        self.path = path
+        self.split_keys = tuple(split_keys)
+        self.save_delay_ms = save_delay_ms
+        self.data = {}
+        self._dirty = set()
+        self._widget = None
+        self._timer = None
+
+    def load(self):
+        try: self.data = load_config_file(self.path, self.split_keys)
+        except (FileNotFoundError, json.JSONDecodeError): self.data = {}
+        # Move keys still embedded in an old main file out into their own files on the next save
+        embedded = [key for key in self.split_keys if key in self.data and not os.path.exists(split_file_path(self.path, key))]
+        if embedded: self._dirty.update(embedded + [None])
+        return self.data
+
+    def attach(self, widget):
+        # Debounced saves are scheduled with the widget's after(); until attached, mark_dirty saves at once
+        self._widget = widget
+
+    def mark_dirty(self, key=None):
+        # key None means "something in the main file" (or everything, when unsure)
+        self._dirty.add(key if key in self.split_keys else None)
+        if key is None: self._dirty.update(self.split_keys)
+        if self._widget is None: self.flush(); return
+        if self._timer is not None: self._widget.after_cancel(self._timer)
+        self._timer = self._widget.after(self.save_delay_ms, self._save_from_timer)
+
+    def _save_from_timer(self):
+        self._timer = None
+        try: self.flush()
+        except OSError as e: print(f"Could not save the configuration: {e}")
+
+    def flush(self):
+        if self._timer is not None and self._widget is not None:
+            self._widget.after_cancel(self._timer); self._timer = None
+        if not self._dirty: return
+        dirty, self._dirty = self._dirty, set()
+        try:
+            for key in self.split_keys:
+                if key in dirty and key in self.data: atomic_write_json(split_file_path(self.path, key), self.data[key])
+            if None in dirty:
+                atomic_write_json(self.path, {k: v for k, v in self.data.items() if k not in self.split_keys})
+        except OSError:
+            self._dirty |= dirty # Retry with the next change or on exit
+            raise
@@ -15,7 +15,9 @@ class ElementEditorWindow(ttk.Toplevel):
         self.live_update_callback = live_update_callback
         self.close_callback = close_callback
         self.inspector_vars = {}
+        self.font_combobox = None
         self._is_populating = True
+        self.controller.subscribe("fonts", self._on_fonts_change)
 
         self.title(f"Edit: {self.element_data.get('name', 'Element')}")
         self.geometry("450x650")
@@ -86,8 +88,7 @@ class ElementEditorWindow(ttk.Toplevel):
         self.create_widget(parent, "Data Source:", r, "dataSource", "combobox", {"values": ["Bike ID", "Bike Name", "Mod Name", "Static Text"]}); r+=1
         if self.element_data.get("dataSource") == "Static Text":
             self.create_widget(parent, "Static Text:", r, "staticText", "entry"); r+=1
-        font_names = self.controller.get_font_names()
-        self.create_widget(parent, "Font:", r, "font_path", "combobox", {"values": font_names, "rebuild_ui_on_select": False}); r+=1
+        self.create_widget(parent, "Font:", r, "font_path", "font_combobox"); r+=1
         self.create_widget(parent, "Size:", r, "size", "spinbox", {"from_": 8, "to": 500}); r+=1
         self.create_widget(parent, "Rotation:", r, "rotation", "spinbox", {"from_": -360, "to": 360}); r+=1
         self.create_widget(parent, "Color:", r, "color", "color"); r+=1
@@ -97,6 +98,7 @@ class ElementEditorWindow(ttk.Toplevel):
         ttk.Separator(parent).grid(row=r, column=0, columnspan=3, sticky='ew', pady=10); r+=1
         self.create_widget(parent, "Outline Size:", r, "outline_size", "spinbox", {"from_": 0, "to": 20}); r+=1
         self.create_widget(parent, "Outline Color:", r, "outline_color", "color"); r+=1
+        self.create_widget(parent, "Outline Shape:", r, "outline_shape", "combobox", {"values": ["square", "round"], "rebuild_ui_on_select": False}); r+=1
 
     # --- NO CHANGES to other methods ---
     # (Rest of the file is identical)
@@ -136,12 +138,37 @@ class ElementEditorWindow(ttk.Toplevel):
             widget = ttk.Combobox(widget_frame, textvariable=var, values=options.get("values", []), state="readonly")
             if options.get("rebuild_ui_on_select", True):
                 widget.bind("<<ComboboxSelected>>", lambda e: self.build_ui())
+        elif widget_type == "font_combobox":
+            # Editable so typing filters the list (faces are grouped by family); only a complete font name is applied
+            widget_frame.columnconfigure(0, weight=1)
+            widget = ttk.Combobox(widget_frame, textvariable=var, values=self.controller.get_font_names())
+            widget.bind("<KeyRelease>", lambda e: self._filter_fonts(e))
+            widget.bind("<FocusOut>", lambda e: self._restore_font_name())
+            self.font_combobox = widget
         elif widget_type == "aspect_ratio":
             widget_frame.columnconfigure(0, weight=1)
             widget = ttk.Combobox(widget_frame, textvariable=var, values=["Fit (Keep Ratio)", "Stretch to Fill"], state="readonly")
         if widget:
             widget.grid(row=0, column=0, sticky=tk.EW)
 
+    def _filter_fonts(self, event):
+        if event.keysym in ("Return", "KP_Enter", "Escape", "Up", "Down"): return
+        self.font_combobox['values'] = self.controller.search_font_names(self.font_combobox.get())
+
+    def _restore_font_name(self):
+        var = self.inspector_vars.get('font_path')
+        if var is None or self.controller.has_font(var.get()): return
+        var.set(self.controller.get_font_name_from_path(self.element_data.get('font_path')))
+
+    def _on_fonts_change(self):
+        # The background font scan finished with a different list
+        if self.font_combobox is None or not self.font_combobox.winfo_exists(): return
+        if self.focus_get() is not self.font_combobox:
+            # The element's font may only now have a name (or a different one)
+            self.inspector_vars['font_path'].set(self.controller.get_font_name_from_path(self.element_data.get('font_path')))
+            self.font_combobox['values'] = self.controller.get_font_names()
+        else: self.font_combobox['values'] = self.controller.search_font_names(self.font_combobox.get())
+
     def create_var(self, key, value):
         if key == 'font_path':
             display_name = self.controller.get_font_name_from_path(value)
@@ -160,6 +187,7 @@ class ElementEditorWindow(ttk.Toplevel):
         if self._is_populating: return
         value_to_store = None
         if key == 'font_path':
+            if not self.controller.has_font(value): return # Still typing a search
             value_to_store = self.controller.get_font_path(value)
         elif key == 'aspect_ratio':
             value_to_store = "stretch" if value == "Stretch to Fill" else "fit"
@@ -201,6 +229,7 @@ class ElementEditorWindow(ttk.Toplevel):
         self.destroy()
     
     def destroy(self):
+        self.controller.unsubscribe("fonts", self._on_fonts_change)
         if self.close_callback:
             self.close_callback()
         super().destroy()
\ No newline at end of file
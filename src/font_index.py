@@ -0,0 +1,118 @@
+# --- Filename: src/font_index.py ---
+import os
+import threading
+from PIL import ImageFont
+
+from src.app_storage import user_cache_dir, atomic_write_json, read_json
+
+INDEX_VERSION = 1
+FONT_EXTENSIONS = ('.ttf', '.otf')
+# Styles listed first within a family; anything else follows alphabetically
+STYLE_ORDER = ("Regular", "Book", "Normal", "Roman", "Medium", "Italic", "Bold", "Bold Italic")
+
+def read_font_names(path):
+    # (family, style) from the font's name table, or a name derived from the file name if FreeType can't read it
+    try:
+        family, style = ImageFont.truetype(path, 12).getname()
+        if family: return family, style or "Regular"
+    except (OSError, ValueError): pass
+    return os.path.splitext(os.path.basename(path))[0].replace('-', ' ').replace('_', ' '), ""
+
+def style_sort_key(style):
+    return (STYLE_ORDER.index(style) if style in STYLE_ORDER else len(STYLE_ORDER), style.lower())
+
+class FontIndex:
+    # Persisted per font folder: every directory in its tree with its mtime, subdirectories and
+    # font files, plus each font's family/style. A directory's mtime changes whenever an entry is
+    # added, removed or renamed in it, so a rescan only lists directories whose mtime moved and only
+    # opens fonts that are new or whose mtime/size changed.
+    def __init__(self, path):
+        self.path = path
+        self.folders = {}
+        self._lock = threading.Lock()
+        data = read_json(path, {})
+        if isinstance(data, dict) and data.get("version") == INDEX_VERSION: self.folders = data.get("folders", {})
+
+    def fonts(self, folders):
+        # [(path, family, style)] for the given folders as last indexed, without touching the disk
+        with self._lock:
+            return [(path, info["family"], info["style"]) for folder in folders for path, info in self.folders.get(folder, {}).get("fonts", {}).items()]
+
+    def rescan(self, folder):
+        # Brings one folder's entry up to date; returns False if the folder isn't a directory
+        if not os.path.isdir(folder):
+            with self._lock: self.folders.pop(folder, None)
+            return False
+        with self._lock:
+            old = self.folders.get(folder, {})
+            old_dirs, old_fonts = dict(old.get("dirs", {})), dict(old.get("fonts", {}))
+        dirs, fonts = {}, {}
+        pending = [folder]
+        while pending:
+            dir_path = pending.pop()
+            try: mtime_ns = os.stat(dir_path).st_mtime_ns
+            except OSError: continue
+            entry = old_dirs.get(dir_path)
+            if entry is None or entry["mtime_ns"] != mtime_ns:
+                entry = self._list_dir(dir_path, mtime_ns)
+                if entry is None: continue
+            dirs[dir_path] = entry
+            pending.extend(os.path.join(dir_path, name) for name in entry["subdirs"])
+            for name in entry["files"]:
+                path = os.path.join(dir_path, name)
+                fonts[path] = self._font_info(path, old_fonts.get(path))
+        with self._lock: self.folders[folder] = {"dirs": dirs, "fonts": {p: info for p, info in fonts.items() if info is not None}}
+        return True
+
+    def _list_dir(self, dir_path, mtime_ns):
+        subdirs, files = [], []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    # Symlinked directories aren't followed (as with os.walk), so a link cycle can't trap the scan
+                    if entry.is_dir(follow_symlinks=False): subdirs.append(entry.name)
+                    elif entry.name.lower().endswith(FONT_EXTENSIONS): files.append(entry.name)
+        except OSError: return None
+        return {"mtime_ns": mtime_ns, "subdirs": sorted(subdirs), "files": sorted(files)}
+
+    def _font_info(self, path, old):
+        try: st = os.stat(path)
+        except OSError: return None
+        if old and old["mtime_ns"] == st.st_mtime_ns and old["bytes"] == st.st_size: return old
+        family, style = read_font_names(path)
+        return {"mtime_ns": st.st_mtime_ns, "bytes": st.st_size, "family": family, "style": style}
+
+    def save(self, keep_folders=None):
+        with self._lock:
+            if keep_folders is not None: self.folders = {f: e for f, e in self.folders.items() if f in keep_folders}
+            atomic_write_json(self.path, {"version": INDEX_VERSION, "folders": self.folders})
+
+class FontScanner:
+    # Rescans the font folders on a background thread. on_result([(path, family, style), ...]) is
+    # called on the scanning thread, so the UI must hand it over to the Tk thread itself; a newer
+    # scan supersedes one still in flight.
+    def __init__(self, index_path=None):
+        self.index = FontIndex(index_path or os.path.join(user_cache_dir("fonts"), "font_index.json"))
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def cached(self, folders):
+        return self.index.fonts(folders)
+
+    def scan_async(self, folders, on_result):
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        folders = list(folders)
+        threading.Thread(target=self._scan, args=(generation, folders, on_result), name="font-scan", daemon=True).start()
+
+    def _scan(self, generation, folders, on_result):
+        for folder in folders:
+            with self._lock:
+                if generation != self._generation: return
+            self.index.rescan(folder)
+        with self._lock:
+            if generation != self._generation: return
+        try: self.index.save(keep_folders=set(folders))
+        except OSError as e: print(f"Could not save the font index: {e}")
+        on_result(self.index.fonts(folders))
@@ -1,14 +1,19 @@
 # --- Filename: src/image_previewer.py ---
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import messagebox
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from PIL import Image, ImageTk, ImageDraw, ImageFont
-import os
 import uuid
-import copy
+import json
+import hashlib
 
 from src.element_editor_ui import ElementEditorWindow
+from src.preview_rendering import PreviewComposer
+from src.render_plan import compile_render_plan
+from src.render_worker import LatestWinsRenderer
+from src.render_cache import FrameCache, prefix_cache
+from src import startup_trace
 
 class ImagePreviewer(ttk.Frame):
     # Define canvas and display dimensions
@@ -16,8 +21,10 @@ class ImagePreviewer(ttk.Frame):
     PREVIEW_HEIGHT = 1080
     DISPLAY_WIDTH = 640 # Keep the UI display small and fast
     DISPLAY_HEIGHT = int(DISPLAY_WIDTH * (9 / 16)) # 360
+    RENDER_POLL_MS = 15 # How often the UI checks for a finished background render
+    PREFETCH_DELAY_MS = 300 # Quiet time after a frame is shown before neighbouring bikes are pre-rendered
 
-    def __init__(self, parent, controller, bike_data):
+    def __init__(self, parent, controller, bike_data, hold_rendering=False):
         super().__init__(parent)
         self.controller = controller
         self.bike_data = bike_data
@@ -26,14 +33,30 @@ class ImagePreviewer(ttk.Frame):
         self.current_index = -1
         self.current_image_tk = None
         self.editor_window = None
+        self._composer = None
+        self._composer_key = None
+        # Renders run off the Tk thread; only the newest requested frame is ever shown
+        self._renderer = LatestWinsRenderer()
+        self._render_poll_id = None
+        self._status_text = ""
+        # Finished frames per (scene, bike); neighbouring bikes are pre-rendered into it when the UI is idle
+        self._frame_cache = FrameCache()
+        self._frame_scene_key = None
+        self._frame_scene = None
+        self._prefetch_id = None
+        # While held (during startup) no render is started; start_rendering() renders the current frame
+        self._rendering_held = hold_rendering
         self.build_ui()
+        # Element edits refresh the hierarchy and the frame; a new thumbnail folder only needs a re-render
+        self.controller.subscribe("preview_elements", self._on_elements_change)
+        self.controller.subscribe("thumbnail_folder_path", self.render_preview)
         self.after(100, self._set_initial_state)
 
     def _set_initial_state(self):
         elements = self.controller.get_setting("preview_elements", [])
         if elements: self.hierarchy_listbox.selection_set(0)
 
-    def on_config_update(self):
+    def _on_elements_change(self):
         self.populate_hierarchy_list()
         self.render_preview()
 
@@ -62,6 +85,8 @@ class ImagePreviewer(ttk.Frame):
         self.status_label.grid(row=0, column=1, sticky="ew")
         self.next_button = ttk.Button(controls_frame, text=">", command=self.show_next, bootstyle="outline")
         self.next_button.grid(row=0, column=2, padx=(5, 0))
+        self.high_quality_var = tk.BooleanVar(value=self.controller.get_setting("high_quality_preview", False))
+        ttk.Checkbutton(controls_frame, text="High-quality preview (full 1920x1080 render)", variable=self.high_quality_var, command=self._on_high_quality_toggle, bootstyle="round-toggle").grid(row=1, column=0, columnspan=3, sticky="w", pady=(5, 0))
 
         # --- HIERARCHY & CONTROLS (BOTTOM) ---
         hierarchy_container = ttk.Labelframe(self, text="4. Element Hierarchy", padding=10)
@@ -95,60 +120,113 @@ class ImagePreviewer(ttk.Frame):
         self.populate_hierarchy_list()
         self.update_preview([])
 
+    def start_rendering(self):
+        if not self._rendering_held: return
+        self._rendering_held = False
+        self.render_preview()
+
     def render_preview(self, elements_override=None):
         if self.current_index == -1:
             self.image_label.config(image=self._get_placeholder()); return
         
         bike_id = self.selected_bikes[self.current_index]
-        self.status_label.config(text=f"{bike_id} ({self.current_index + 1}/{len(self.selected_bikes)})")
+        self._status_text = f"{bike_id} ({self.current_index + 1}/{len(self.selected_bikes)})"
+        self.status_label.config(text=self._status_text)
+        if self._rendering_held:
+            self.image_label.config(image=self._get_placeholder("Loading...")); return
         
         elements = elements_override if elements_override is not None else self.controller.get_setting("preview_elements", [])
-        
-        # Render on the full-size canvas in memory
-        final_image = Image.new("RGBA", (self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT))
-
-        try:
-            for elem in elements:
-                if not elem.get("visible", True): continue
-                elem_type = elem.get("type")
-
-                if elem_type == "background":
-                    path = elem.get("path")
-                    if path and os.path.exists(path):
-                        with Image.open(path).convert("RGBA") as bg_img:
-                            self._paste_image_element(final_image, bg_img, elem)
-                    else:
-                        color_img = Image.new("RGBA", final_image.size, elem.get("color", "#FFFFFF"))
-                        final_image.paste(color_img, (0,0))
-                
-                elif elem_type in ["bike_image", "image"]:
-                    thumb_folder = self.controller.get_setting("thumbnail_folder_path")
-                    source_path = os.path.join(thumb_folder, f"{bike_id}.png") if elem_type == "bike_image" else elem.get("path")
-                    if source_path and os.path.exists(source_path):
-                        with Image.open(source_path).convert("RGBA") as fg_img:
-                            self._paste_image_element(final_image, fg_img, elem)
-
-                elif elem_type == "text":
-                    text_to_draw = ""
-                    source = elem.get("dataSource")
-                    if source == "Bike ID": text_to_draw = bike_id
-                    elif source == "Bike Name":
-                        bike_name = next((name for name, b_id in self.bike_data if b_id == bike_id), bike_id)
-                        text_to_draw = bike_name
-                    elif source == "Mod Name": text_to_draw = self.current_mod_name
-                    elif source == "Static Text": text_to_draw = elem.get("staticText", "")
-                    if text_to_draw:
-                        self._draw_text_element(final_image, text_to_draw, elem)
-
-            rgb_img = final_image.convert('RGB')
-            # Downscale the final render ONLY for display in the UI
-            rgb_img.thumbnail((self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT), Image.Resampling.LANCZOS)
-            self.current_image_tk = ImageTk.PhotoImage(rgb_img)
-            self.image_label.config(image=self.current_image_tk)
-
-        except Exception as e:
-            print(f"Error rendering preview: {e}")
-            self.image_label.config(image=self._get_placeholder("Error"))
+        # Snapshot everything the render needs now; the worker thread must not read live UI state
+        elements = [dict(elem) for elem in elements]
+        mod_name = self.current_mod_name
+        thumb_folder = self.controller.get_setting("thumbnail_folder_path")
+        # Full-size render downscaled for display, or straight at display size (positions, font sizes and outlines scaled to match)
+        scale = 1.0 if self.high_quality_var.get() else self.DISPLAY_WIDTH / self.PREVIEW_WIDTH
+        scene = (elements, mod_name, thumb_folder, scale)
+        scene_key = hashlib.sha1(json.dumps(scene, sort_keys=True).encode("utf-8")).hexdigest()
+        if scene_key != self._frame_scene_key:
+            # Any edit to the elements (or mod, thumbnails, quality) makes every cached frame stale
+            self._frame_cache.clear()
+            self._renderer.submit_idle([])
+            self._frame_scene_key, self._frame_scene = scene_key, scene
+
+        if self._prefetch_id is not None: self.after_cancel(self._prefetch_id); self._prefetch_id = None
+        cached = self._frame_cache.get((scene_key, bike_id))
+        if cached is not None:
+            self._renderer.cancel()
+            self._show_frame(cached, self._status_text)
+            self._schedule_prefetch(scene_key, scene)
+            return
+        self._renderer.submit(lambda: self._render_frame(scene_key, scene, bike_id))
+        if self._render_poll_id is None: self._render_poll_id = self.after(self.RENDER_POLL_MS, self._poll_render)
+
+    def _render_frame(self, scene_key, scene, bike_id):
+        # Runs on the render thread
+        rgb_img = self._get_composer(scene_key, scene).render(bike_id).convert('RGB')
+        if scene[3] == 1.0: rgb_img.thumbnail((self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT), Image.Resampling.LANCZOS)
+        self._frame_cache.put((scene_key, bike_id), rgb_img)
+        return rgb_img
+
+    def _schedule_prefetch(self, scene_key, scene):
+        if self._prefetch_id is not None: self.after_cancel(self._prefetch_id)
+        self._prefetch_id = self.after(self.PREFETCH_DELAY_MS, lambda: self._prefetch_neighbours(scene_key, scene))
+
+    def _prefetch_neighbours(self, scene_key, scene):
+        # Queue the other selected bikes nearest-first (next, previous, next but one, ...) as background jobs;
+        # a click on < or > pre-empts them and later ones are replaced by the next prefetch
+        self._prefetch_id = None
+        if scene_key != self._frame_scene_key or self.current_index == -1: return
+        count = len(self.selected_bikes)
+        order = []
+        for distance in range(1, count // 2 + 1):
+            for step in (distance, -distance):
+                bike_id = self.selected_bikes[(self.current_index + step) % count]
+                if bike_id not in order and bike_id != self.selected_bikes[self.current_index]: order.append(bike_id)
+        def job(bike_id):
+            def run():
+                if not self._frame_cache.contains((scene_key, bike_id)): self._render_frame(scene_key, scene, bike_id)
+            return run
+        self._renderer.submit_idle([job(bike_id) for bike_id in order])
+
+    def _poll_render(self):
+        self._render_poll_id = None
+        result = self._renderer.poll()
+        if result is not None:
+            _, rgb_img, error, latency = result
+            if error is not None:
+                print(f"Error rendering preview: {error}")
+                self.image_label.config(image=self._get_placeholder("Error"))
+            elif self.current_index != -1:
+                self._show_frame(rgb_img, f"{self._status_text}  ·  {latency * 1000:.0f} ms")
+                self._schedule_prefetch(self._frame_scene_key, self._frame_scene)
+        if self._renderer.busy(): self._render_poll_id = self.after(self.RENDER_POLL_MS, self._poll_render)
+
+    def _show_frame(self, rgb_img, status_text):
+        self.current_image_tk = ImageTk.PhotoImage(rgb_img)
+        self.image_label.config(image=self.current_image_tk)
+        self.status_label.config(text=status_text)
+        startup_trace.mark("first preview shown")
+
+    def render_latency_stats(self):
+        return self._renderer.stats.summary()
+
+    def _get_composer(self, scene_key, scene):
+        # Reuse the composer (and its cached base layers) while only the bike changes. Only called from the render thread.
+        if scene_key != self._composer_key:
+            elements, mod_name, thumb_folder, scale = scene
+            # The shared prefix cache lets a composer for an edited scene resume above the unchanged layers
+            plan = compile_render_plan(elements, mod_name, thumb_folder, self.bike_data, (self.PREVIEW_WIDTH, self.PREVIEW_HEIGHT), scale)
+            self._composer = PreviewComposer(plan, prefix_cache)
+            self._composer_key = scene_key
+        return self._composer
+
+    def destroy(self):
+        self._renderer.close()
+        super().destroy()
+
+    def _on_high_quality_toggle(self):
+        self.controller.update_setting("high_quality_preview", self.high_quality_var.get(), broadcast=False)
+        self.render_preview()
 
     def _get_placeholder(self, text="No bikes selected"):
         # Create placeholder at the display size
@@ -165,12 +243,19 @@ class ImagePreviewer(ttk.Frame):
     # (Rest of the file is identical)
     def populate_hierarchy_list(self):
         current_selection = self.hierarchy_listbox.curselection()
-        self.hierarchy_listbox.delete(0, tk.END)
         elements = self.controller.get_setting("preview_elements", [])
-        for element in elements:
-            vis_char = "●" if element.get("visible", True) else "○"
-            self.hierarchy_listbox.insert(tk.END, f' {vis_char} {element.get("name", "Untitled")}')
-        
+        labels = [f' {"●" if element.get("visible", True) else "○"} {element.get("name", "Untitled")}' for element in elements]
+        current_labels = self.hierarchy_listbox.get(0, tk.END)
+        if len(labels) == len(current_labels):
+            # Same number of rows: only rewrite the rows whose label changed
+            for i, (label, current) in enumerate(zip(labels, current_labels)):
+                if label != current:
+                    self.hierarchy_listbox.delete(i)
+                    self.hierarchy_listbox.insert(i, label)
+        else:
+            self.hierarchy_listbox.delete(0, tk.END)
+            for label in labels: self.hierarchy_listbox.insert(tk.END, label)
+
         if current_selection and current_selection[0] < self.hierarchy_listbox.size():
             self.hierarchy_listbox.selection_set(current_selection[0])
             self.hierarchy_listbox.activate(current_selection[0])
@@ -191,21 +276,23 @@ class ImagePreviewer(ttk.Frame):
             )
 
     def _handle_live_update(self, index, temp_data):
+        # Called on every spinbox tick/keystroke; render_preview snapshots the elements and queues the render,
+        # so a burst of edits collapses into the newest frame
         current_elements = self.controller.get_setting("preview_elements", [])
-        temp_elements = copy.deepcopy(current_elements)
-        if index < len(temp_elements):
+        if index < len(current_elements):
+            temp_elements = list(current_elements)
             temp_elements[index] = temp_data
             self.render_preview(elements_override=temp_elements)
 
     def _handle_editor_close(self):
         self.editor_window = None
-        self.on_config_update()
+        self._on_elements_change()
 
     def add_element(self, elem_type):
         elements = self.controller.get_setting("preview_elements", [])
         new_elem = {}
         if elem_type == "text":
-            new_elem = {"id": str(uuid.uuid4()), "name": "New Text", "type": "text", "visible": True, "dataSource": "Static Text", "staticText": "Hello", "font_path": "arial.ttf", "size": 80, "color": "#FFFFFF", "align": "center", "pos_x": self.PREVIEW_WIDTH//2, "pos_y": self.PREVIEW_HEIGHT//2, "outline_size": 1, "outline_color": "#000000", "rotation": 0}
+            new_elem = {"id": str(uuid.uuid4()), "name": "New Text", "type": "text", "visible": True, "dataSource": "Static Text", "staticText": "Hello", "font_path": "arial.ttf", "size": 80, "color": "#FFFFFF", "align": "center", "pos_x": self.PREVIEW_WIDTH//2, "pos_y": self.PREVIEW_HEIGHT//2, "outline_size": 1, "outline_color": "#000000", "outline_shape": "square", "rotation": 0}
         elif elem_type == "image":
             new_elem = {"id": str(uuid.uuid4()), "name": "New Image", "type": "image", "visible": True, "path": "", "pos_x": self.PREVIEW_WIDTH//2, "pos_y": self.PREVIEW_HEIGHT//2, "scale": 0.5, "rotation": 0, "aspect_ratio": "fit"}
         else: return
@@ -255,49 +342,6 @@ class ImagePreviewer(ttk.Frame):
         if is_empty: self.status_label.config(text="No bikes selected")
         self.render_preview()
         
-    def _paste_image_element(self, final_image, source_image, settings):
-        scale = float(settings.get("scale", 1.0))
-        rotation = int(settings.get("rotation", 0))
-        pos_x, pos_y = int(settings.get("pos_x", self.PREVIEW_WIDTH//2)), int(settings.get("pos_y", self.PREVIEW_HEIGHT//2))
-        aspect_ratio = settings.get("aspect_ratio", "fit")
-        if aspect_ratio == "stretch":
-            img_to_paste = source_image.resize(final_image.size, Image.Resampling.LANCZOS)
-        else: 
-            new_size = (int(final_image.width * scale), int(final_image.height * scale))
-            img_to_paste = source_image.copy()
-            img_to_paste.thumbnail(new_size, Image.Resampling.LANCZOS)
-        if rotation != 0:
-            img_to_paste = img_to_paste.rotate(rotation, expand=True, resample=Image.Resampling.BICUBIC)
-        offset = (pos_x - img_to_paste.width // 2, pos_y - img_to_paste.height // 2)
-        final_image.paste(img_to_paste, offset, img_to_paste)
-
-    def _draw_text_element(self, image, text, settings):
-        try: font = ImageFont.truetype(settings.get("font_path"), int(settings.get("size")))
-        except (IOError, ValueError, TypeError): font = ImageFont.load_default()
-        rotation = int(settings.get("rotation", 0))
-        outline_size = int(settings.get("outline_size", 0))
-        pos_x, pos_y = int(settings.get("pos_x", self.PREVIEW_WIDTH//2)), int(settings.get("pos_y", self.PREVIEW_HEIGHT//2))
-        text_bbox = font.getbbox(text)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        padding = outline_size * 2
-        temp_size = (text_width + padding, text_height + padding)
-        txt_img = Image.new('RGBA', temp_size, (255, 255, 255, 0))
-        d = ImageDraw.Draw(txt_img)
-        draw_pos = (padding/2 - text_bbox[0], padding/2 - text_bbox[1])
-        if outline_size > 0:
-            outline_color = settings.get("outline_color", "#000000")
-            for i in range(-outline_size, outline_size + 1):
-                for j in range(-outline_size, outline_size + 1):
-                    if i != 0 or j != 0:
-                        d.text((draw_pos[0] + i, draw_pos[1] + j), text, font=font, fill=outline_color)
-        d.text(draw_pos, text, font=font, fill=settings.get("color", "#FFFFFF"))
-        if rotation != 0:
-            txt_img = txt_img.rotate(rotation, expand=True, resample=Image.Resampling.BICUBIC)
-        final_pos_x = pos_x - (txt_img.width / 2)
-        final_pos_y = pos_y - (txt_img.height / 2)
-        image.paste(txt_img, (int(final_pos_x), int(final_pos_y)), txt_img)
-
     def show_next(self):
         if not self.selected_bikes: return
         self.current_index = (self.current_index + 1) % len(self.selected_bikes)
@@ -0,0 +1,110 @@
+# --- Filename: src/library_scanner.py ---
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.app_storage import user_cache_dir, atomic_write_json, read_json
+
+INDEX_VERSION = 1
+MAX_SCAN_THREADS = 8
+
+def library_mtime(library_path):
+    try: return os.stat(library_path).st_mtime_ns
+    except OSError: return None
+
+def list_mod_folders(library_path):
+    # One os.scandir pass; DirEntry.is_dir() uses the type from the directory listing where the OS provides it
+    with os.scandir(library_path) as entries:
+        return sorted(entry.name for entry in entries if entry.is_dir())
+
+class LibraryIndex:
+    # Persisted {library path: {"mtime_ns", "mods"}}. A directory's mtime changes whenever an entry is
+    # added, removed or renamed in it, so a library whose mtime matches the index isn't listed again.
+    def __init__(self, path):
+        self.path = path
+        self.libraries = {}
+        self._lock = threading.Lock()
+        data = read_json(path, {})
+        if isinstance(data, dict) and data.get("version") == INDEX_VERSION: self.libraries = data.get("libraries", {})
+
+    def cached_mods(self, library_path):
+        with self._lock:
+            entry = self.libraries.get(library_path)
+            return list(entry["mods"]) if entry else None
+
+    def scan(self, library_path):
+        # Returns the library's mod folders, or None if it isn't a readable directory
+        try: mtime_ns = os.stat(library_path).st_mtime_ns
+        except OSError: return None
+        with self._lock:
+            entry = self.libraries.get(library_path)
+            if entry and entry["mtime_ns"] == mtime_ns: return list(entry["mods"])
+        try: mods = list_mod_folders(library_path)
+        except (NotADirectoryError, PermissionError, FileNotFoundError): return None
+        with self._lock: self.libraries[library_path] = {"mtime_ns": mtime_ns, "mods": mods}
+        return mods
+
+    def add_mod(self, library_path, mod_name, mtime_before=None):
+        # Record a mod folder created by a build without re-listing the library. mtime_before is the
+        # library's mtime when the build started: only if the index was current then is the build's own
+        # change the only one, and the stored mtime may advance. Otherwise it stays stale, so the next
+        # scan lists the library again and picks up whatever else changed.
+        mtime_ns = library_mtime(library_path)
+        if mtime_ns is None: return None
+        with self._lock:
+            entry = self.libraries.get(library_path)
+            if entry is None: return None
+            if os.path.isdir(os.path.join(library_path, mod_name)) and mod_name not in entry["mods"]:
+                entry["mods"] = sorted(entry["mods"] + [mod_name])
+            if mtime_before is not None and entry["mtime_ns"] == mtime_before: entry["mtime_ns"] = mtime_ns
+            return list(entry["mods"])
+
+    def save(self, keep_paths=None):
+        with self._lock:
+            if keep_paths is not None: self.libraries = {p: e for p, e in self.libraries.items() if p in keep_paths}
+            data = {"version": INDEX_VERSION, "libraries": self.libraries}
+            atomic_write_json(self.path, data)
+
+class LibraryScanner:
+    # Scans the configured libraries on a background thread, several libraries at a time.
+    # Results come back as {library path: [mod folder, ...]} through on_result, which is called
+    # on the scanning thread: the UI must hand it over to the Tk thread itself. A newer scan
+    # supersedes an older one still in flight.
+    def __init__(self, index_path=None):
+        self.index = LibraryIndex(index_path or os.path.join(user_cache_dir("libraries"), "library_index.json"))
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def cached(self, library_paths):
+        # Whatever the index knew at the last scan, without touching the disk
+        result = {}
+        for path in library_paths:
+            mods = self.index.cached_mods(path)
+            if mods is not None: result[path] = mods
+        return result
+
+    def scan_async(self, library_paths, on_result):
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        library_paths = list(library_paths)
+        threading.Thread(target=self._scan, args=(generation, library_paths, on_result), name="library-scan", daemon=True).start()
+
+    def _scan(self, generation, library_paths, on_result):
+        result = {}
+        if library_paths:
+            with ThreadPoolExecutor(max_workers=min(MAX_SCAN_THREADS, len(library_paths))) as pool:
+                for path, mods in zip(library_paths, pool.map(self.index.scan, library_paths)):
+                    if mods is not None: result[path] = mods
+        try: self.index.save(keep_paths=set(library_paths))
+        except OSError as e: print(f"Could not save the library index: {e}")
+        with self._lock:
+            if generation != self._generation: return
+        on_result(result)
+
+    def refresh_mod(self, library_path, mod_name, mtime_before=None):
+        mods = self.index.add_mod(library_path, mod_name, mtime_before)
+        if mods is None: mods = self.index.scan(library_path)
+        try: self.index.save()
+        except OSError as e: print(f"Could not save the library index: {e}")
+        return mods
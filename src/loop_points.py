@@ -0,0 +1,225 @@
+# --- Filename: src/loop_points.py ---
+# Loop-point detection for the sounds the game loops (engine and idle). One streamed pass over the
+# file builds a decimated mono mix; the loop length comes from its FFT autocorrelation (the lag at
+# which the end of the recording best repeats its start) and is refined at the full sample rate on
+# a short window. The start is then placed on a rising zero crossing near the beginning and the end
+# on the offset around start + length that joins it most smoothly. Only those windows are read at
+# the full rate, so memory stays small and minutes of audio are analysed in a fraction of a second.
+#
+# The seam score is the jump in the waveform's second difference where the loop wraps around,
+# relative to the recording's own RMS second difference: around 1 or below is as smooth as the
+# audio itself, values in the tens are an audible click.
+import os
+import json
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from src.app_storage import user_cache_dir, atomic_write_json, read_json, hash_file
+from src.wav_inspector import parse_wav_header, iter_float_chunks, read_float_frames, WavFormatError
+from src.audio_processing import write_wav_header
+
+LOOP_VERSION = 1
+ANALYSIS_RATE = 4000 # Coarse search rate; engine fundamentals sit well below its Nyquist
+MIN_LOOP_FRACTION = 0.5 # A loop keeps at least this much of the recording
+MIN_OVERLAP_SECONDS = 0.1 # Shortest stretch of start and end that must match
+REFINE_SECONDS = 0.25
+START_SEARCH_SECONDS = 1.0 # Loop starts are looked for this far into the recording
+END_SEARCH_SECONDS = 0.001 # The end may move this far from start + length to meet a smooth join
+COPY_CHUNK = 1024 * 1024
+
+# Frames; the loop is [start, end). correlation is the normalised match of the audio either side of the seam.
+LoopPoints = namedtuple("LoopPoints", ["start", "end", "sample_rate", "seam_score", "original_seam_score", "correlation"])
+
+class LoopNotFound(ValueError):
+    pass
+
+def _mono(frames):
+    # Much faster than mean(axis=1) over a short axis
+    return frames @ np.full(frames.shape[1], 1.0 / frames.shape[1], dtype=frames.dtype)
+
+def _scan_samples(path, info, factor):
+    # One streamed pass: the mono mix averaged over blocks of `factor` frames, and the RMS second
+    # difference. float32 is plenty for both and halves the memory traffic.
+    blocks, carry = [], np.zeros(0, dtype=np.float32)
+    previous, total_sq = np.zeros((0, info.channels), dtype=np.float32), 0.0
+    for _, chunk in iter_float_chunks(path, info, dtype=np.float32):
+        mono = np.concatenate([carry, _mono(chunk)])
+        usable = len(mono) // factor * factor
+        blocks.append(mono[:usable].reshape(-1, factor).mean(axis=1))
+        carry = mono[usable:]
+        d2 = np.diff(np.concatenate([previous, chunk]), n=2, axis=0).ravel()
+        total_sq += float(np.dot(d2, d2))
+        previous = chunk[-2:]
+    return np.concatenate(blocks).astype(np.float64), (total_sq / max((info.frames - 2) * info.channels, 1)) ** 0.5
+
+def _fft_size(n):
+    # Smallest 2^a * 3^b * 5^c >= n; numpy's FFT is fast for these and they waste far less than a power of two
+    best = 1 << max(int(n - 1).bit_length(), 0)
+    fives = 1
+    while fives < best:
+        threes = fives
+        while threes < best:
+            size = threes << max(int(-(-n // threes) - 1).bit_length(), 0)
+            best = min(best, size)
+            threes *= 3
+        fives *= 5
+    return best
+
+def _seam_clicks(head, tail, starts, ends):
+    # RMS over channels of the two second differences that straddle each seam, where the loop runs from
+    # head[starts] to just before tail[ends] (tail is the slice of the file the ends fall in)
+    before = head[starts] - 2 * tail[ends - 1] + tail[ends - 2]
+    after = head[starts + 1] - 2 * head[starts] + tail[ends - 1]
+    return np.sqrt((before * before + after * after).mean(axis=-1) / 2)
+
+def _coarse_lag(coarse, analysis_rate):
+    # Best loop length in decimated frames and its correlation (coarse is made zero-mean in place)
+    n = len(coarse)
+    lags = np.arange(max(1, int(MIN_LOOP_FRACTION * n)), n - max(2, int(MIN_OVERLAP_SECONDS * analysis_rate)) + 1)
+    if len(lags) < 3: raise LoopNotFound("too short to find a loop")
+    coarse -= coarse.mean()
+    # Only lags of at least MIN_LOOP_FRACTION count, so the autocorrelation there is the cross-correlation
+    # of the head coarse[:m] with the tail coarse[lags[0]:], which needs an FFT half the usual size
+    m = n - lags[0]
+    size = _fft_size(2 * m - 1)
+    spectrum = np.fft.rfft(coarse[:m], size)
+    np.conj(spectrum, out=spectrum)
+    spectrum *= np.fft.rfft(coarse[lags[0]:], size)
+    autocorr = np.fft.irfft(spectrum, size)[:len(lags)]
+    del spectrum
+    # Energies of the overlapping head (coarse[:n-L]) and tail (coarse[L:]) for every lag L
+    energy = np.concatenate([[0.0], np.cumsum(coarse * coarse)])
+    norm = np.sqrt(energy[n - lags] * (energy[n] - energy[lags]))
+    # Silence (or a constant offset) correlates with nothing
+    if not (norm > 0).any(): raise LoopNotFound("no signal to find a loop in")
+    corr = np.divide(autocorr, norm, out=np.zeros(len(lags)), where=norm > 0)
+    # Of the peaks that match about as well as the best one, take the longest loop
+    peaks = np.flatnonzero((corr[1:-1] >= corr[:-2]) & (corr[1:-1] >= corr[2:])) + 1
+    if len(peaks) == 0: peaks = np.array([int(np.argmax(corr))])
+    best = peaks[corr[peaks] >= corr[peaks].max() - 0.01][-1]
+    return int(lags[best]), float(corr[best])
+
+def _refine_lag(path, info, lag, factor):
+    # Normalised correlation of the first REFINE window against the window lag frames later, for
+    # every full-rate lag within two coarse frames of the estimate
+    n = info.frames
+    window = min(int(REFINE_SECONDS * info.sample_rate), n - (lag * factor + 2 * factor))
+    if window < 2: return min(lag * factor, n - 2), 0.0
+    reference = _mono(read_float_frames(path, info, 0, window))
+    candidates = np.arange(max(2, (lag - 2) * factor), min(n - window, (lag + 2) * factor) + 1)
+    mono = _mono(read_float_frames(path, info, candidates[0], candidates[-1] + window))
+    windows = np.lib.stride_tricks.sliding_window_view(mono, window)
+    energy = np.concatenate([[0.0], np.cumsum(mono * mono)])
+    norm = np.sqrt(np.dot(reference, reference) * (energy[window:] - energy[:-window]))
+    corr = np.divide(windows @ reference, norm, out=np.zeros(len(candidates)), where=norm > 0)
+    best = int(np.argmax(corr))
+    return int(candidates[best]), float(corr[best])
+
+def find_loop(path, info=None):
+    # Raises LoopNotFound when the file is too short, WavFormatError / OSError when unreadable
+    info = info or parse_wav_header(path)
+    if info.frames < 4: raise LoopNotFound("too short to find a loop")
+    factor = max(1, info.sample_rate // ANALYSIS_RATE)
+    coarse, typical = _scan_samples(path, info, factor)
+    typical = typical or 1.0
+    lag, _ = _coarse_lag(coarse, info.sample_rate / factor)
+    length, correlation = _refine_lag(path, info, lag, factor)
+    # Candidate starts on rising zero crossings near the beginning, ends within END_SEARCH of start + length
+    reach = max(1, int(END_SEARCH_SECONDS * info.sample_rate))
+    last_start = max(1, min(info.frames - length - reach, int(START_SEARCH_SECONDS * info.sample_rate)))
+    head = read_float_frames(path, info, 0, last_start + 1)
+    head_mono = _mono(head)
+    starts = np.flatnonzero((head_mono[:last_start - 1] < 0) & (head_mono[1:last_start] >= 0)) + 1
+    if len(starts) == 0: starts = np.arange(0, min(last_start, len(head) - 1))
+    # The file slice every candidate end (and the frame after it) falls in
+    tail_first = max(0, int(starts[0]) + length - reach - 2)
+    tail = read_float_frames(path, info, tail_first, int(starts[-1]) + length + reach + 1)
+    tail_mono = _mono(tail)
+    ends = starts[:, None] + length + np.arange(-reach, reach + 1)[None, :]
+    valid = (ends >= 2) & (ends <= info.frames) & (ends > starts[:, None] + 2)
+    ends = np.clip(ends, max(2, tail_first + 2), info.frames)
+    local = ends - tail_first
+    clicks = np.where(valid, _seam_clicks(head, tail, np.broadcast_to(starts[:, None], ends.shape), local), np.inf)
+    # Prefer ends that also fall just before a rising zero crossing, like the start
+    following = tail_mono[np.minimum(local, len(tail) - 1)]
+    aligned = valid & (tail_mono[local - 1] < 0) & (following >= 0) & (ends < info.frames)
+    if aligned.any(): clicks = np.where(aligned, clicks, np.inf)
+    if not np.isfinite(clicks).any(): raise LoopNotFound("no usable loop points")
+    k, j = np.unravel_index(int(np.argmin(clicks)), clicks.shape)
+    start, end = int(starts[k]), int(ends[k, j])
+    last_frames = read_float_frames(path, info, info.frames - 2, info.frames)
+    original = float(_seam_clicks(head, last_frames, np.array([0]), np.array([2]))[0])
+    return LoopPoints(start, end, info.sample_rate, float(clicks[k, j]) / typical, original / typical, correlation)
+
+def describe_loop(loop):
+    # e.g. "Loop 0.012–3.204 s · Seam 0.6 (untrimmed 14.2) · Match 98%"
+    return (f"Loop {loop.start / loop.sample_rate:.3f}–{loop.end / loop.sample_rate:.3f} s · "
+            f"Seam {loop.seam_score:.1f} (untrimmed {loop.original_seam_score:.1f}) · Match {max(loop.correlation, 0) * 100:.0f}%")
+
+def write_loop(src_path, dst_path, start, end):
+    # Copies frames [start, end) byte for byte into a new WAV in the source's own format
+    info = parse_wav_header(src_path)
+    block_align = info.channels * info.bits_per_sample // 8
+    remaining = (end - start) * block_align
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        write_wav_header(dst, info.channels, info.sample_rate, info.bits_per_sample, end - start, info.format_tag)
+        src.seek(info.data_offset + start * block_align)
+        while remaining > 0:
+            chunk = src.read(min(remaining, COPY_CHUNK))
+            if not chunk: raise WavFormatError("file ended before the loop end")
+            dst.write(chunk)
+            remaining -= len(chunk)
+        if ((end - start) * block_align) % 2: dst.write(b"\0")
+
+class LoopAnalyzer:
+    # Loop points are cached in memory and in a per-user index keyed by absolute path, mtime and size,
+    # like the WAV stats; trimmed copies live beside it, named after the content hash and the loop.
+    # analyze_async's on_result(path, loop, error) is called on the worker thread.
+    def __init__(self, folder=None):
+        self.folder = folder or user_cache_dir("loops")
+        self.index_path = os.path.join(self.folder, "loop_points.json")
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="loop-points")
+        self.entries = {}
+        data = read_json(self.index_path, {})
+        if isinstance(data, dict) and data.get("version") == LOOP_VERSION: self.entries = data.get("entries", {})
+
+    def analyze(self, path):
+        # LoopPoints for the file; raises LoopNotFound / WavFormatError / OSError
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock: entry = self.entries.get(key)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["bytes"] == st.st_size: return LoopPoints(*entry["loop"])
+        loop = find_loop(path)
+        with self._lock:
+            self.entries[key] = {"mtime_ns": st.st_mtime_ns, "bytes": st.st_size, "loop": list(loop)}
+            self.entries = {p: e for p, e in self.entries.items() if os.path.exists(p)}
+            try: atomic_write_json(self.index_path, {"version": LOOP_VERSION, "entries": self.entries})
+            except OSError as e: print(f"Could not save the loop point cache: {e}")
+        return loop
+
+    def analyze_async(self, path, on_result):
+        def run():
+            try: loop = self.analyze(path)
+            except (OSError, ValueError) as e: on_result(path, None, e)
+            else: on_result(path, loop, None)
+        self._pool.submit(run)
+
+    def trimmed(self, path):
+        # (path of the copy trimmed to its loop, LoopPoints); written to a temp file and renamed into place
+        loop = self.analyze(path)
+        key = json.dumps({"version": LOOP_VERSION, "input": hash_file(path), "loop": [loop.start, loop.end]}, sort_keys=True)
+        cache_path = os.path.join(self.folder, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".wav")
+        if os.path.exists(cache_path): return cache_path, loop
+        tmp_path = f"{cache_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            write_loop(path, tmp_path, loop.start, loop.end)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        return cache_path, loop
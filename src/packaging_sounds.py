@@ -2,132 +2,246 @@
 import os
 import zipfile
 import io
-from PIL import Image, ImageDraw, ImageFont
+import zlib
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from src.build_manifest import BuildManifest
+from src.preview_rendering import PreviewComposer
+from src.render_plan import compile_render_plan
+
+# A sound file deflated once, ready to be stored in any number of bike archives
+CompressedSound = namedtuple("CompressedSound", ["filename", "data", "crc", "file_size", "date_time", "external_attr"])
+
+SOUND_READ_CHUNK = 1024 * 1024
+LOOP_SOUNDS = ("engine", "idle") # Sounds the game loops; only these can be trimmed to their loop points
+
+def compress_sound_file(sound_path, arcname=None):
+    # Same deflate settings ZipFile uses for ZIP_DEFLATED, so the stored bytes match what zipf.write() produced
+    template = zipfile.ZipInfo.from_file(sound_path, arcname or os.path.basename(sound_path))
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    chunks, crc, file_size = [], 0, 0
+    with open(sound_path, 'rb') as f:
+        while True:
+            chunk = f.read(SOUND_READ_CHUNK)
+            if not chunk: break
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            chunks.append(compressor.compress(chunk))
+    chunks.append(compressor.flush())
+    return CompressedSound(template.filename, b"".join(chunks), crc, file_size, template.date_time, template.external_attr)
+
+def compress_sound_files(sound_paths, arcnames=None):
+    arcnames = arcnames or {}
+    return {name: compress_sound_file(path, arcnames.get(name)) for name, path in sound_paths.items()}
+
+def process_sounds(sound_paths, audio_settings, log_callback):
+    # Converted copies (from the shared cache) of every sound; they keep their original names in the zips
+    from src.audio_processing import AudioProcessor, describe_settings # Deferred: pulls in numpy
+    processor = AudioProcessor()
+    processed = {name: processor.process(path, audio_settings) for name, path in sound_paths.items()}
+    log_callback(f"  - Converted {len(processed)} sound file(s): {describe_settings(audio_settings)}")
+    return processed
+
+def trim_loop_sounds(sound_paths, loop_sounds, log_callback):
+    # The given sounds replaced by copies (from the shared cache) trimmed to their detected loop points
+    from src.loop_points import LoopAnalyzer, describe_loop # Deferred: pulls in numpy
+    analyzer = LoopAnalyzer()
+    trimmed = dict(sound_paths)
+    for name in loop_sounds:
+        trimmed[name], loop = analyzer.trimmed(sound_paths[name])
+        log_callback(f"  - Trimmed {name} to its loop: {describe_loop(loop)}")
+    return trimmed
+
+def write_compressed_sound(zipf, arcname, sound):
+    zinfo = zipfile.ZipInfo(arcname, date_time=sound.date_time)
+    zinfo.external_attr = sound.external_attr
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size = sound.file_size
+    zinfo.compress_size = len(sound.data)
+    zinfo.CRC = sound.crc
+    # ZipFile has no public API for storing already-deflated data, so this mirrors
+    # the bookkeeping ZipFile.write() does once its compressor has finished
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    zinfo.header_offset = zipf.fp.tell()
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    zipf.fp.write(sound.data)
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+
+def bike_output_paths(mod_path, mod_name, bike_id):
+    base = os.path.join(mod_path, f"{bike_id} {mod_name}")
+    return [f"{base}.zip", f"{base}.png"]
+
+def _temp_output_path(path):
+    # A hidden file beside the final output, renamed over it once complete. Created with the normal
+    # permissions (unlike mkstemp's 0600), which the renamed output keeps.
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+
+def _package_bike(mod_path, mod_name, bike_id, compressed_sounds, composer, log_callback):
+    # The zip and PNG are written to temp files and renamed into place at the end, so a failed or
+    # interrupted bike never leaves a half-written archive where the game would pick it up
+    log_callback(f"  - Packaging bike: {bike_id}")
+    zip_filename = f"{bike_id} {mod_name}.zip"
+    zip_path = os.path.join(mod_path, zip_filename)
+    has_errors = False
+    tmp_zip_path = tmp_png_path = None
 
-def draw_rotated_text(image, text, settings):
-    # This function is unchanged
     try:
-        font_path = settings.get("font_path", "arial.ttf")
-        font_size = int(settings.get("size", 20))
-        font = ImageFont.truetype(font_path, font_size)
-    except (IOError, ValueError, TypeError): 
-        font = ImageFont.load_default()
-    rotation = int(settings.get("rotation", 0))
-    outline_size = int(settings.get("outline_size", 0))
-    outline_color = settings.get("outline_color", "#000000")
-    text_color = settings.get("color", "#FFFFFF")
-    pos_x, pos_y = int(settings.get("pos_x", 128)), int(settings.get("pos_y", 128))
-    text_bbox = font.getbbox(text)
-    text_width = text_bbox[2] - text_bbox[0]
-    text_height = text_bbox[3] - text_bbox[1]
-    padding = outline_size * 2
-    temp_size = (text_width + padding, text_height + padding)
-    txt_img = Image.new('RGBA', temp_size, (255, 255, 255, 0))
-    d = ImageDraw.Draw(txt_img)
-    draw_pos = (padding/2 - text_bbox[0], padding/2 - text_bbox[1])
-    if outline_size > 0:
-        for i in range(-outline_size, outline_size + 1):
-            for j in range(-outline_size, outline_size + 1):
-                if i != 0 or j != 0:
-                    d.text((draw_pos[0] + i, draw_pos[1] + j), text, font=font, fill=outline_color)
-    d.text(draw_pos, text, font=font, fill=text_color)
-    if rotation != 0:
-        txt_img = txt_img.rotate(rotation, expand=True, resample=Image.Resampling.BICUBIC)
-    final_pos_x = pos_x - (txt_img.width / 2)
-    final_pos_y = pos_y - (txt_img.height / 2)
-    image.paste(txt_img, (int(final_pos_x), int(final_pos_y)), txt_img)
-
-def paste_rotated_image(final_image, source_image, settings):
-    # This function is unchanged
-    scale = float(settings.get("scale", 1.0))
-    rotation = int(settings.get("rotation", 0))
-    pos_x, pos_y = int(settings.get("pos_x", 128)), int(settings.get("pos_y", 128))
-    aspect_ratio = settings.get("aspect_ratio", "fit")
-    if aspect_ratio == "stretch":
-        img_to_paste = source_image.resize((final_image.width, final_image.height), Image.Resampling.LANCZOS)
-    else: # "fit"
-        new_size = (int(final_image.width * scale), int(final_image.height * scale))
-        img_to_paste = source_image.copy()
-        img_to_paste.thumbnail(new_size, Image.Resampling.LANCZOS)
-    if rotation != 0:
-        img_to_paste = img_to_paste.rotate(rotation, expand=True, resample=Image.Resampling.BICUBIC)
-    offset = (pos_x - img_to_paste.width // 2, pos_y - img_to_paste.height // 2)
-    final_image.paste(img_to_paste, offset, img_to_paste)
-
-def generate_preview_image(bike_id, mod_name, thumbnail_folder, preview_elements, bike_data):
-    # This function is unchanged
-    final_image = Image.new("RGBA", (1920, 1080))
-    for elem in preview_elements:
-        if not elem.get("visible", True): continue
-        elem_type = elem.get("type")
-        if elem_type == "background":
-            path = elem.get("path")
-            if path and os.path.exists(path):
-                with Image.open(path).convert("RGBA") as bg_img:
-                    paste_rotated_image(final_image, bg_img, elem)
-            else:
-                color_img = Image.new("RGBA", final_image.size, elem.get("color", "#FFFFFF"))
-                final_image.paste(color_img, (0,0))
-        elif elem_type in ["bike_image", "image"]:
-            thumb_folder = thumbnail_folder
-            source_path = os.path.join(thumb_folder, f"{bike_id}.png") if elem_type == "bike_image" else elem.get("path")
-            if source_path and os.path.exists(source_path):
-                with Image.open(source_path).convert("RGBA") as fg_img:
-                    paste_rotated_image(final_image, fg_img, elem)
-        elif elem_type == "text":
-            text_to_draw = ""
-            source = elem.get("dataSource")
-            if source == "Bike ID": text_to_draw = bike_id
-            elif source == "Bike Name":
-                bike_name = next((name for name, b_id in bike_data if b_id == bike_id), bike_id)
-                text_to_draw = bike_name
-            elif source == "Mod Name": text_to_draw = mod_name
-            elif source == "Static Text": text_to_draw = elem.get("staticText", "")
-            if text_to_draw:
-                draw_rotated_text(final_image, text_to_draw, elem)
-    return final_image.convert('RGB')
-
-def create_sound_mod_package(output_library_path, mod_name, selected_bikes, sound_paths, thumbnail_folder, preview_elements, bike_data, log_callback):
+        tmp_zip_path = _temp_output_path(zip_path)
+        with zipfile.ZipFile(tmp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            num_sounds = len(compressed_sounds)
+            for _, sound in compressed_sounds.items():
+                write_compressed_sound(zipf, f"{bike_id}/{sound.filename}", sound)
+            log_callback(f"    - Added {num_sounds} sound file(s) to {os.path.basename(zip_path)}")
+
+            try:
+                # Generate the high-quality 1920x1080 image in memory
+                preview_image = composer.render(bike_id).convert('RGB')
+                
+                # Save a copy of the preview image as a PNG file next to the zip
+                png_filename_base = os.path.splitext(zip_filename)[0]
+                png_path = os.path.join(mod_path, f"{png_filename_base}.png")
+                tmp_png_path = _temp_output_path(png_path)
+                preview_image.save(tmp_png_path, 'PNG')
+                os.replace(tmp_png_path, png_path); tmp_png_path = None
+                log_callback(f"    - Saved external preview as {os.path.basename(png_path)}")
+                
+                # Convert the final RGB image to JPEG format in memory for the zip
+                img_byte_arr = io.BytesIO()
+                preview_image.save(img_byte_arr, format='JPEG', quality=95) # High quality JPEG
+                
+                # Write the byte array to the zip file as preview.jpg
+                zipf.writestr(f"{bike_id}/preview.jpg", img_byte_arr.getvalue())
+                log_callback(f"    - Added preview.jpg for {bike_id} with custom layers.")
+
+            except Exception as img_e:
+                log_callback(f"    - ERROR: Failed to process image for {bike_id}. Reason: {img_e}"); has_errors = True
+        
+        os.replace(tmp_zip_path, zip_path); tmp_zip_path = None
+        log_callback(f"    - Successfully created {os.path.basename(zip_path)}")
+    except Exception as e:
+        log_callback(f"    - FATAL ERROR creating zip for {bike_id}: {e}")
+        return False
+    finally:
+        for tmp_path in (tmp_zip_path, tmp_png_path):
+            if tmp_path:
+                try: os.remove(tmp_path)
+                except OSError: pass
+    return not has_errors
+
+_worker_compressed_sounds = {}
+_worker_composer = None
+
+def _init_packaging_worker(compressed_sounds, plan):
+    # The compressed audio and the compiled scene are shipped to each worker once instead of with
+    # every bike task, so each worker also composites the shared base layers only once
+    global _worker_compressed_sounds, _worker_composer
+    _worker_compressed_sounds = compressed_sounds
+    _worker_composer = PreviewComposer(plan)
+
+def _package_bike_buffered(mod_path, mod_name, bike_id):
+    # Runs inside a worker process; log lines are shipped back and replayed in bike order by the parent
+    lines = []
+    try: success = _package_bike(mod_path, mod_name, bike_id, _worker_compressed_sounds, _worker_composer, lines.append)
+    except Exception as e: lines.append(f"    - FATAL ERROR packaging {bike_id}: {e}"); success = False
+    return success, lines
+
+def resolve_worker_count(workers, num_bikes):
+    # 0 / None means "one worker per core", capped by the amount of work available
+    if not workers: workers = os.cpu_count() or 1
+    return max(1, min(int(workers), num_bikes))
+
+def create_sound_mod_package(output_library_path, mod_name, selected_bikes, sound_paths, thumbnail_folder, preview_elements, bike_data, log_callback, workers=1, incremental=True, progress_callback=None, cancel_event=None, audio_settings=None, loop_sounds=None):
+    # audio_settings: the "audio_processing" config (see src/audio_processing.py); when enabled the
+    # sounds are converted before packaging. loop_sounds: names of sounds to trim to their detected
+    # loop points first (see src/loop_points.py); only LOOP_SOUNDS with a sound are trimmed.
+    # progress_callback(done, total, bike_id) runs after each built bike. Once cancel_event is set no
+    # further bike is started; bikes already being packaged finish (outputs are only ever renamed into
+    # place complete), the manifest keeps what was built and the result is False.
     mod_path = os.path.join(output_library_path, mod_name)
+    loop_sounds = sorted(name for name in set(loop_sounds or ()) if name in sound_paths and name in LOOP_SOUNDS)
+    if audio_settings:
+        from src.audio_processing import active_audio_settings
+        try: audio_settings = active_audio_settings(audio_settings)
+        except (ValueError, TypeError) as e: log_callback(f"ERROR: Invalid audio processing settings. Reason: {e}"); return False
     try: os.makedirs(mod_path, exist_ok=True)
     except OSError as e: log_callback(f"ERROR: Failed to create mod directory at '{mod_path}'. Reason: {e}"); return False
 
-    has_errors = False
-    for bike_id in selected_bikes:
-        log_callback(f"  - Packaging bike: {bike_id}")
-        zip_filename = f"{bike_id} {mod_name}.zip"
-        zip_path = os.path.join(mod_path, zip_filename)
-
-        try:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                num_sounds = len(sound_paths)
-                for _, sound_path in sound_paths.items():
-                    arcname = f"{bike_id}/{os.path.basename(sound_path)}"
-                    zipf.write(sound_path, arcname)
-                log_callback(f"    - Added {num_sounds} sound file(s) to {os.path.basename(zip_path)}")
-
-                try:
-                    # Generate the high-quality 1920x1080 image in memory
-                    preview_image = generate_preview_image(bike_id, mod_name, thumbnail_folder, preview_elements, bike_data)
-                    
-                    # Save a copy of the preview image as a PNG file next to the zip
-                    png_filename_base = os.path.splitext(zip_filename)[0]
-                    png_path = os.path.join(mod_path, f"{png_filename_base}.png")
-                    preview_image.save(png_path, 'PNG')
-                    log_callback(f"    - Saved external preview as {os.path.basename(png_path)}")
-                    
-                    # Convert the final RGB image to JPEG format in memory for the zip
-                    img_byte_arr = io.BytesIO()
-                    preview_image.save(img_byte_arr, format='JPEG', quality=95) # High quality JPEG
-                    
-                    # Write the byte array to the zip file as preview.jpg
-                    zipf.writestr(f"{bike_id}/preview.jpg", img_byte_arr.getvalue())
-                    log_callback(f"    - Added preview.jpg for {bike_id} with custom layers.")
-
-                except Exception as img_e:
-                    log_callback(f"    - ERROR: Failed to process image for {bike_id}. Reason: {img_e}"); has_errors = True
-            
-            log_callback(f"    - Successfully created {os.path.basename(zip_path)}")
-        except Exception as e:
-            log_callback(f"    - FATAL ERROR creating zip for {bike_id}: {e}"); has_errors = True; return False
-    return not has_errors
\ No newline at end of file
+    # Bikes whose inputs match the manifest from the previous build of this mod are left alone
+    manifest = BuildManifest(mod_path)
+    try: fingerprints = {bike_id: manifest.bike_fingerprint(bike_id, mod_name, sound_paths, thumbnail_folder, preview_elements, bike_data, audio_settings, loop_sounds) for bike_id in selected_bikes}
+    except OSError as e: log_callback(f"ERROR: Failed to read build inputs. Reason: {e}"); return False
+    bikes_to_build = selected_bikes
+    if incremental:
+        bikes_to_build = [b for b in selected_bikes if not manifest.is_up_to_date(b, fingerprints[b], bike_output_paths(mod_path, mod_name, b))]
+        skipped = [b for b in selected_bikes if b not in bikes_to_build]
+        if skipped: log_callback(f"  - Skipping {len(skipped)} unchanged bike(s): {', '.join(skipped)}")
+    if not bikes_to_build:
+        log_callback("  - All selected bikes are up to date")
+        _save_manifest(manifest, log_callback)
+        return True
+
+    packaged_paths = sound_paths
+    if loop_sounds:
+        try: packaged_paths = trim_loop_sounds(packaged_paths, loop_sounds, log_callback)
+        except (OSError, ValueError) as e: log_callback(f"ERROR: Failed to trim sound file to its loop. Reason: {e}"); return False
+    if audio_settings:
+        try: packaged_paths = process_sounds(packaged_paths, audio_settings, log_callback)
+        except (OSError, ValueError) as e: log_callback(f"ERROR: Failed to convert sound file. Reason: {e}"); return False
+    # Read and deflate every sound once; each bike archive then just stores the same compressed bytes
+    try: compressed_sounds = compress_sound_files(packaged_paths, {name: os.path.basename(path) for name, path in sound_paths.items()})
+    except OSError as e: log_callback(f"ERROR: Failed to read sound file. Reason: {e}"); return False
+    log_callback(f"  - Compressed {len(compressed_sounds)} sound file(s) once for {len(bikes_to_build)} bike(s)")
+    # Interpret the preview elements once; every bike renders from the same plan
+    try: plan = compile_render_plan(preview_elements, mod_name, thumbnail_folder, bike_data)
+    except (ValueError, TypeError) as e: log_callback(f"ERROR: Invalid preview element settings. Reason: {e}"); return False
+
+    failed_bikes, finished_bikes = [], []
+    def finish_bike(bike_id, success):
+        if success: manifest.record(bike_id, fingerprints[bike_id], bike_output_paths(mod_path, mod_name, bike_id))
+        else: manifest.forget(bike_id); failed_bikes.append(bike_id)
+        finished_bikes.append(bike_id)
+        if progress_callback: progress_callback(len(finished_bikes), len(bikes_to_build), bike_id)
+    def cancelled(): return cancel_event is not None and cancel_event.is_set()
+
+    workers = resolve_worker_count(workers, len(bikes_to_build))
+    if workers == 1:
+        composer = PreviewComposer(plan)
+        for bike_id in bikes_to_build:
+            if cancelled(): break
+            finish_bike(bike_id, _package_bike(mod_path, mod_name, bike_id, compressed_sounds, composer, log_callback))
+    else:
+        log_callback(f"  - Packaging {len(bikes_to_build)} bike(s) with {workers} worker processes")
+        # Spawned, not forked: the GUI calls this from a worker thread, and forking a threaded process can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_packaging_worker, initargs=(compressed_sounds, plan)) as pool:
+            futures = [
+                pool.submit(_package_bike_buffered, mod_path, mod_name, bike_id)
+                for bike_id in bikes_to_build
+            ]
+            # Consume in submission order so the log reads exactly like a sequential run
+            for bike_id, future in zip(bikes_to_build, futures):
+                if cancelled() and not future.done():
+                    # Bikes no worker has picked up yet are dropped; the rest complete before shutdown returns
+                    pool.shutdown(wait=True, cancel_futures=True)
+                if future.cancelled(): continue
+                try: success, lines = future.result()
+                except Exception as e: success, lines = False, [f"  - Packaging bike: {bike_id}", f"    - FATAL ERROR: worker process failed: {e}"]
+                for line in lines: log_callback(line)
+                finish_bike(bike_id, success)
+
+    _save_manifest(manifest, log_callback)
+    if failed_bikes:
+        log_callback(f"  - {len(failed_bikes)} of {len(bikes_to_build)} bike(s) had errors: {', '.join(failed_bikes)}")
+    if len(finished_bikes) < len(bikes_to_build):
+        log_callback(f"  - Cancelled after {len(finished_bikes)} of {len(bikes_to_build)} bike(s)")
+        return False
+    return not failed_bikes
+
+def _save_manifest(manifest, log_callback):
+    # A manifest that can't be written only costs a full rebuild next time
+    try: manifest.save()
+    except OSError as e: log_callback(f"  - WARNING: Could not write build manifest. Reason: {e}")
@@ -0,0 +1,253 @@
+# --- Filename: src/preview_rendering.py ---
+import os
+import json
+import uuid
+import hashlib
+from PIL import Image, ImageChops, ImageDraw
+from src.render_cache import load_rgba_image, load_font, sprite_cache
+from src.render_plan import Placement, compile_render_plan, is_bike_dependent, scaled_size
+
+OUTLINE_SHAPES = ("square", "round")
+
+def default_preview_elements():
+    return [
+        {"id": str(uuid.uuid4()), "name": "Background", "type": "background", "visible": True, "path": "", "color": "#FFFFFF", "pos_x": 960, "pos_y": 540, "scale": 1.0, "rotation": 0, "aspect_ratio": "fit"},
+        {"id": str(uuid.uuid4()), "name": "Bike Image", "type": "bike_image", "visible": True, "pos_x": 960, "pos_y": 540, "scale": 0.85, "rotation": 0, "aspect_ratio": "fit"},
+        {"id": str(uuid.uuid4()), "name": "Bike ID", "type": "text", "visible": True, "dataSource": "Bike ID", "staticText": "", "font_path": "arial.ttf", "size": 80, "color": "#FFFFFF", "align": "center", "pos_x": 960, "pos_y": 80, "outline_size": 2, "outline_color": "#000000", "outline_shape": "square", "rotation": 0},
+        {"id": str(uuid.uuid4()), "name": "Mod Name", "type": "text", "visible": True, "dataSource": "Mod Name", "staticText": "", "font_path": "arial.ttf", "size": 70, "color": "#FFFFFF", "align": "center", "pos_x": 960, "pos_y": 1000, "outline_size": 2, "outline_color": "#000000", "outline_shape": "square", "rotation": 0}
+    ]
+
+def draw_rotated_text(image, text, settings):
+    txt_img = render_text_sprite(text, settings)
+    image.paste(txt_img, text_offset(txt_img, settings), txt_img)
+
+def render_text_sprite(text, settings):
+    try: font_size = int(settings.get("size", 20))
+    except (ValueError, TypeError): font_size = None
+    font_path = settings.get("font_path", "arial.ttf")
+    rotation = int(settings.get("rotation", 0))
+    outline_size = int(settings.get("outline_size", 0))
+    outline_color = settings.get("outline_color", "#000000")
+    outline_shape = settings.get("outline_shape", "square")
+    text_color = settings.get("color", "#FFFFFF")
+    return text_sprite(text, (font_path, font_size, text_color, outline_size, outline_color, outline_shape, rotation))
+
+def text_sprite(text, sprite_key):
+    # sprite_key is (font_path, font_size, color, outline_size, outline_color, outline_shape, rotation), as in TextLayer
+    return sprite_cache.get((text,) + sprite_key, lambda: _rasterize_text(text, *sprite_key))
+
+def _rasterize_text(text, font_path, font_size, text_color, outline_size, outline_color, outline_shape, rotation):
+    font = load_font(font_path, font_size)
+    text_bbox = font.getbbox(text)
+    text_width = text_bbox[2] - text_bbox[0]
+    text_height = text_bbox[3] - text_bbox[1]
+    padding = outline_size * 2
+    temp_size = (text_width + padding, text_height + padding)
+    txt_img = Image.new('RGBA', temp_size, (255, 255, 255, 0))
+    d = ImageDraw.Draw(txt_img)
+    draw_pos = (padding/2 - text_bbox[0], padding/2 - text_bbox[1])
+    if outline_size > 0 and outline_shape == "round":
+        # FreeType's stroker draws a round-joined outline and the fill in a single pass
+        d.text(draw_pos, text, font=font, fill=text_color, stroke_width=outline_size, stroke_fill=outline_color)
+    else:
+        if outline_size > 0:
+            # Square outline: the glyph mask spread over the (2n+1)^2 neighbourhood in one bitmap draw,
+            # instead of stamping the whole string once per offset
+            mask = Image.new('L', temp_size, 0)
+            ImageDraw.Draw(mask).text(draw_pos, text, font=font, fill=255)
+            d.bitmap((0, 0), spread_square(mask, outline_size), fill=outline_color)
+        d.text(draw_pos, text, font=font, fill=text_color)
+    if rotation != 0:
+        txt_img = txt_img.rotate(rotation, expand=True, resample=Image.Resampling.BICUBIC)
+    return txt_img
+
+def spread_square(mask, radius):
+    # Coverage of the mask stamped at every offset of a (2r+1)x(2r+1) square, combined the way repeated
+    # draws combine (1 - product of (1 - coverage)), i.e. a "screen" blend. That product separates
+    # into a horizontal pass followed by a vertical one.
+    return _spread_axis(_spread_axis(mask, radius, 0), radius, 1)
+
+def _spread_axis(mask, radius, axis):
+    # Screen-blends the mask over a window of 2r+1 offsets using power-of-two blocks, so the cost grows with
+    # log2(r) instead of r; blocks never overlap, so every offset is counted exactly once. The work canvas
+    # is widened by 2r so nothing is clipped while the window slides, then cropped back centred.
+    width = 2 * radius + 1
+    padded_size = (mask.width + 2 * radius, mask.height) if axis == 0 else (mask.width, mask.height + 2 * radius)
+    block = Image.new(mask.mode, padded_size, 0)
+    block.paste(mask, (0, 0))
+    result, covered, block_width = None, 0, 1
+    while True:
+        if width & block_width:
+            part = _shift(block, covered, axis)
+            result = part if result is None else ImageChops.screen(result, part)
+            covered += block_width
+        if block_width * 2 > width: break
+        block = ImageChops.screen(block, _shift(block, block_width, axis))
+        block_width *= 2
+    crop_origin = (radius, 0) if axis == 0 else (0, radius)
+    return result.crop((crop_origin[0], crop_origin[1], crop_origin[0] + mask.width, crop_origin[1] + mask.height))
+
+def _shift(mask, amount, axis):
+    # Translate without wrap-around; pixels shifted off the edge are dropped
+    shifted = Image.new(mask.mode, mask.size, 0)
+    shifted.paste(mask, (amount, 0) if axis == 0 else (0, amount))
+    return shifted
+
+def text_offset(txt_img, settings):
+    return centered_offset(txt_img, (int(settings.get("pos_x", 128)), int(settings.get("pos_y", 128))))
+
+def centered_offset(txt_img, position):
+    pos_x, pos_y = position
+    final_pos_x = pos_x - (txt_img.width / 2)
+    final_pos_y = pos_y - (txt_img.height / 2)
+    return (int(final_pos_x), int(final_pos_y))
+
+def paste_rotated_image(final_image, source_image, settings):
+    img_to_paste, offset = transform_image(final_image.size, source_image, settings)
+    final_image.paste(img_to_paste, offset, img_to_paste)
+
+def transform_image(canvas_size, source_image, settings):
+    placement = Placement((int(settings.get("pos_x", 128)), int(settings.get("pos_y", 128))), float(settings.get("scale", 1.0)),
+                          int(settings.get("rotation", 0)), settings.get("aspect_ratio", "fit"))
+    return place_image(canvas_size, source_image, placement)
+
+def place_image(canvas_size, source_image, placement, render_scale=1.0):
+    # canvas_size is the design canvas; with render_scale != 1 the image comes out sized for a canvas
+    # render_scale times as big (the placement's position is already in render pixels, see render_plan)
+    (pos_x, pos_y), scale, rotation, aspect_ratio = placement
+    if aspect_ratio == "stretch":
+        img_to_paste = source_image.resize(scaled_size(canvas_size, render_scale), Image.Resampling.LANCZOS)
+    else: # "fit"
+        new_size = (int(canvas_size[0] * scale), int(canvas_size[1] * scale))
+        if render_scale == 1.0:
+            img_to_paste = source_image.copy()
+            img_to_paste.thumbnail(new_size, Image.Resampling.LANCZOS)
+        else:
+            # Size it as it would be fitted on the design canvas (thumbnail never enlarges), so a small image keeps
+            # the same share of the preview at any render size, then resample the source straight to that size
+            target = scaled_size(fit_size(source_image.size, new_size), render_scale)
+            img_to_paste = source_image.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if rotation != 0:
+        img_to_paste = img_to_paste.rotate(rotation, expand=True, resample=Image.Resampling.BICUBIC)
+    offset = (pos_x - img_to_paste.width // 2, pos_y - img_to_paste.height // 2)
+    return img_to_paste, offset
+
+def fit_size(size, box):
+    # The size Image.thumbnail(box) would give: aspect ratio kept, never enlarged
+    ratio = min(box[0] / size[0], box[1] / size[1], 1.0)
+    return (max(1, round(size[0] * ratio)), max(1, round(size[1] * ratio)))
+
+# A prepared layer is either ("fill", image) which replaces the whole canvas,
+# ("paste", image, offset) which is alpha-pasted at offset, or None (nothing to draw).
+def apply_layer(canvas, layer):
+    if layer is None: return
+    if layer[0] == "fill": canvas.paste(layer[1], (0, 0))
+    else: canvas.paste(layer[1], layer[2], layer[1])
+
+class PreviewComposer:
+    # Renders one compiled scene (see render_plan) for any number of bikes.
+    #
+    # The leading run of bike-independent layers (background, static/mod-name text,
+    # plain images) is composited once into a cached RGBA base. Independent layers
+    # above the first bike-dependent one are prepared once and re-pasted per bike;
+    # they can't be merged into a second base because paste() is not associative,
+    # and the output must stay identical to drawing every layer in order.
+    #
+    # The plan's size is the render canvas; its design_size is the canvas the elements were laid
+    # out on, and scale renders the same scene at a fraction of it (e.g. the live preview's display size).
+    #
+    # With a prefix_cache, the composite after every layer is stored under a key chained through
+    # that layer and all layers below it (settings, resolved text, source file stamps). A new
+    # composer for an edited scene then resumes from the deepest unchanged prefix, so tweaking a
+    # text layer doesn't redraw the background and bike image beneath it. The live preview uses
+    # this; packaging renders each bike once and doesn't.
+    def __init__(self, plan, prefix_cache=None):
+        self.plan = plan
+        self.scale = plan.scale
+        self.size = plan.size
+        split = next((i for i, layer in enumerate(plan.layers) if is_bike_dependent(layer)), len(plan.layers))
+        self.base_layers = plan.layers[:split]
+        self.stacked_layers = plan.layers[split:]
+        self.prefix_cache = prefix_cache
+        self._base = None
+        self._static_layers = {}
+
+    def render(self, bike_id):
+        if self.prefix_cache is not None: return self._render_from_prefix(bike_id)
+        canvas = self._get_base().copy()
+        for i, layer in enumerate(self.stacked_layers):
+            apply_layer(canvas, self._stacked_layer(i, layer, bike_id))
+        return canvas
+
+    def _stacked_layer(self, i, layer, bike_id):
+        if is_bike_dependent(layer): return self.prepare_layer(layer, bike_id)
+        if i not in self._static_layers: self._static_layers[i] = self.prepare_layer(layer, None)
+        return self._static_layers[i]
+
+    def _get_base(self):
+        if self._base is None:
+            base = Image.new("RGBA", self.size)
+            for layer in self.base_layers: apply_layer(base, self.prepare_layer(layer, None))
+            self._base = base
+        return self._base
+
+    def _render_from_prefix(self, bike_id):
+        layers = self.plan.layers
+        keys = self.prefix_keys(bike_id)
+        start, canvas = 0, None
+        for k in range(len(layers) - 1, -1, -1):
+            cached = self.prefix_cache.get(keys[k])
+            if cached is not None:
+                start, canvas = k + 1, cached.copy()
+                break
+        if canvas is None: canvas = Image.new("RGBA", self.size)
+        split = len(self.base_layers)
+        for k in range(start, len(layers)):
+            layer = self.prepare_layer(layers[k], None) if k < split else self._stacked_layer(k - split, layers[k], bike_id)
+            apply_layer(canvas, layer)
+            self.prefix_cache.put(keys[k], canvas.copy())
+        return canvas
+
+    def prefix_keys(self, bike_id):
+        # keys[k] identifies the composite of layers 0..k for this bike
+        key = _digest([self.plan.design_size, self.scale])
+        keys = []
+        for layer in self.plan.layers:
+            if layer.kind == "bike_image": inputs = _file_stamp(self.plan.bike_image_path(bike_id))
+            elif layer.kind in ("background", "image"): inputs = _file_stamp(layer.path)
+            elif layer.kind == "text": inputs = [self.plan.text_for(layer, bike_id), _file_stamp(layer.sprite_key[0])]
+            else: inputs = None
+            key = _digest([key, layer, inputs])
+            keys.append(key)
+        return keys
+
+    def prepare_layer(self, layer, bike_id):
+        kind = layer.kind
+        if kind == "fill":
+            return ("fill", Image.new("RGBA", self.size, layer.color))
+        elif kind in ("background", "image", "bike_image"):
+            source_image = load_rgba_image(self.plan.bike_image_path(bike_id) if kind == "bike_image" else layer.path)
+            if source_image is not None:
+                img, offset = place_image(self.plan.design_size, source_image, layer.placement, self.scale)
+                return ("paste", img, offset)
+            # A background image deleted since the plan was compiled falls back to its colour, as an empty path does
+            if kind == "background": return ("fill", Image.new("RGBA", self.size, layer.color))
+        elif kind == "text":
+            text_to_draw = self.plan.text_for(layer, bike_id)
+            if text_to_draw:
+                txt_img = text_sprite(text_to_draw, layer.sprite_key)
+                return ("paste", txt_img, centered_offset(txt_img, layer.position))
+        return None
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _file_stamp(path):
+    # Identifies a source file's current contents cheaply; unresolvable paths (font names, missing files) stand for themselves
+    try: st = os.stat(path)
+    except (OSError, TypeError, ValueError): return path
+    return [os.path.abspath(path), st.st_mtime_ns, st.st_size]
+
+def generate_preview_image(bike_id, mod_name, thumbnail_folder, preview_elements, bike_data, composer=None):
+    composer = composer or PreviewComposer(compile_render_plan(preview_elements, mod_name, thumbnail_folder, bike_data))
+    return composer.render(bike_id).convert('RGB')
@@ -0,0 +1,174 @@
+# --- Filename: src/render_cache.py ---
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageFont
+
+DEFAULT_IMAGE_CACHE_BYTES = 512 * 1024 * 1024
+DEFAULT_SPRITE_CACHE_BYTES = 128 * 1024 * 1024
+DEFAULT_FONT_CACHE_ENTRIES = 64
+DEFAULT_FRAME_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_PREFIX_CACHE_BYTES = 192 * 1024 * 1024
+
+class _ByteBoundedLRU:
+    # Thread-safe LRU with eviction by an approximate byte size per entry
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _store(self, key, value, nbytes):
+        with self._lock:
+            if nbytes > self.max_bytes or key in self._entries: return
+            self._entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _discard(self, key):
+        _, nbytes = self._entries.pop(key)
+        self.total_bytes -= nbytes
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class ImageCache(_ByteBoundedLRU):
+    # Size-bounded LRU of decoded RGBA images shared by the previewer and the packager.
+    # Entries are keyed by (path, mtime, size) so an edited file is picked up on the next
+    # lookup; eviction is by total pixel bytes. Cached images are shared: callers must
+    # treat them as read-only (copy/resize/rotate before drawing on them).
+    def __init__(self, max_bytes=DEFAULT_IMAGE_CACHE_BYTES):
+        super().__init__(max_bytes)
+        self._key_by_path = {}
+
+    def get(self, path):
+        # Returns None when the file doesn't exist, mirroring the old os.path.exists() checks
+        try: st = os.stat(path)
+        except (OSError, TypeError, ValueError): return None
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        image = self._lookup(key)
+        if image is not None: return image
+
+        with Image.open(path) as source:
+            image = source.convert("RGBA")
+
+        with self._lock:
+            stale_key = self._key_by_path.get(key[0])
+            if stale_key is not None and stale_key != key and stale_key in self._entries: self._discard(stale_key)
+            self._key_by_path[key[0]] = key
+        self._store(key, image, image.width * image.height * 4)
+        return image
+
+    def _discard(self, key):
+        if self._key_by_path.get(key[0]) == key: del self._key_by_path[key[0]]
+        return super()._discard(key)
+
+    def clear(self):
+        with self._lock: self._key_by_path.clear()
+        super().clear()
+
+def font_stamp(font_path):
+    # (mtime, size) of a font file, so an edited font misses the caches; None for names FreeType resolves itself ("arial.ttf")
+    try: st = os.stat(font_path)
+    except (OSError, TypeError, ValueError): return None
+    return (st.st_mtime_ns, st.st_size)
+
+class FontCache:
+    # Loaded FreeType faces keyed by (path, size, font_stamp). Faces are small, so this is bounded by count.
+    def __init__(self, max_entries=DEFAULT_FONT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._fonts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, font_path, size):
+        key = (font_path, size, font_stamp(font_path))
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                return font
+        try: font = ImageFont.truetype(font_path, size)
+        except (IOError, ValueError, TypeError): font = ImageFont.load_default()
+        with self._lock:
+            self._fonts[key] = font
+            while len(self._fonts) > self.max_entries: self._fonts.popitem(last=False)
+        return font
+
+    def clear(self):
+        with self._lock: self._fonts.clear()
+
+class SpriteCache(_ByteBoundedLRU):
+    # Finished RGBA text sprites (outlined and rotated), keyed by everything that affects their pixels:
+    # the caller's (text, font_path, ...) key plus the font file's stamp, added here.
+    # Like cached images, sprites are shared and must only be pasted, never drawn on.
+    def __init__(self, max_bytes=DEFAULT_SPRITE_CACHE_BYTES):
+        super().__init__(max_bytes)
+
+    def get(self, key, render):
+        key = key + (font_stamp(key[1]),)
+        sprite = self._lookup(key)
+        if sprite is None:
+            sprite = render()
+            self._store(key, sprite, sprite.width * sprite.height * 4)
+        return sprite
+
+class FrameCache(_ByteBoundedLRU):
+    # Finished preview frames keyed by (scene hash, bike id), so flipping back and forth between bikes
+    # doesn't re-render. Callers clear it when the scene changes; stale scenes can never match anyway.
+    def __init__(self, max_bytes=DEFAULT_FRAME_CACHE_BYTES):
+        super().__init__(max_bytes)
+
+    def get(self, key):
+        return self._lookup(key)
+
+    def contains(self, key):
+        with self._lock: return key in self._entries
+
+    def put(self, key, image):
+        self._store(key, image, image.width * image.height * len(image.getbands()))
+
+class PrefixCache(_ByteBoundedLRU):
+    # Composites of the bottom k layers of a scene, keyed by a hash chained through every layer below
+    # (see PreviewComposer). Like the other caches, entries are shared: copy before drawing on them.
+    def __init__(self, max_bytes=DEFAULT_PREFIX_CACHE_BYTES):
+        super().__init__(max_bytes)
+
+    def get(self, key):
+        return self._lookup(key)
+
+    def put(self, key, image):
+        self._store(key, image, image.width * image.height * len(image.getbands()))
+
+image_cache = ImageCache()
+font_cache = FontCache()
+sprite_cache = SpriteCache()
+prefix_cache = PrefixCache()
+
+def load_rgba_image(path):
+    return image_cache.get(path)
+
+def load_font(font_path, size):
+    return font_cache.get(font_path, size)
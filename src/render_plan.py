@@ -0,0 +1,102 @@
+# --- Filename: src/render_plan.py ---
+# Compiles a scene's preview_elements into a RenderPlan: a tuple of compact, typed layers with
+# every setting already converted, defaulted and scaled to the render size, static text resolved,
+# and a bike id -> bike name table. The previewer and the packager both render from a plan, so
+# the raw element dicts are interpreted once per scene instead of once per bike and frame.
+import os
+from collections import namedtuple
+
+PREVIEW_SIZE = (1920, 1080)
+
+# Text data sources whose content changes from one bike to the next
+BIKE_TEXT_SOURCES = ("Bike ID", "Bike Name")
+
+# Where and how an image layer lands on the canvas: position is the centre in render pixels,
+# scale is relative to the design canvas ("fit") and rotation is in degrees
+Placement = namedtuple("Placement", ["position", "scale", "rotation", "aspect_ratio"])
+
+# kind is "fill" (solid background)
+FillLayer = namedtuple("FillLayer", ["kind", "color"])
+# kind is "background" or "image"; color is the fill used if a background image can't be loaded
+ImageLayer = namedtuple("ImageLayer", ["kind", "path", "color", "placement"])
+# kind is "bike_image"; the source is <thumbnail folder>/<bike id>.png
+BikeImageLayer = namedtuple("BikeImageLayer", ["kind", "placement"])
+# kind is "text"; text is None when it depends on the bike (source "Bike ID"/"Bike Name").
+# sprite_key is the text sprite's cache key minus the text itself
+TextLayer = namedtuple("TextLayer", ["kind", "source", "text", "sprite_key", "position"])
+
+class RenderPlan(namedtuple("RenderPlan", ["layers", "mod_name", "thumbnail_folder", "bike_names", "design_size", "scale", "size"])):
+    # Plans are plain tuples so they pickle cheaply into packaging worker processes.
+    # bike_names is a dict but is never modified after compilation.
+    __slots__ = ()
+
+    def bike_image_path(self, bike_id):
+        return os.path.join(self.thumbnail_folder or "", f"{bike_id}.png")
+
+    def text_for(self, layer, bike_id):
+        if layer.text is not None: return layer.text
+        if layer.source == "Bike ID": return bike_id
+        return self.bike_names.get(bike_id, bike_id)
+
+def is_bike_dependent(layer):
+    return layer.kind == "bike_image" or (layer.kind == "text" and layer.text is None)
+
+def scaled_size(size, factor):
+    if factor == 1.0: return size
+    return (max(1, round(size[0] * factor)), max(1, round(size[1] * factor)))
+
+def _scale_position(settings, factor):
+    pos_x, pos_y = int(settings.get("pos_x", 128)), int(settings.get("pos_y", 128))
+    if factor == 1.0: return (pos_x, pos_y)
+    return (round(pos_x * factor), round(pos_y * factor))
+
+def _scale_length(value, factor):
+    # Keep thin outlines and tiny text visible rather than rounding them away
+    if factor == 1.0 or value is None or value <= 0: return value
+    return max(1, round(value * factor))
+
+def _placement(elem, factor):
+    return Placement(_scale_position(elem, factor), float(elem.get("scale", 1.0)), int(elem.get("rotation", 0)), elem.get("aspect_ratio", "fit"))
+
+def _static_text(elem, mod_name):
+    source = elem.get("dataSource")
+    if source == "Mod Name": return mod_name
+    elif source == "Static Text": return elem.get("staticText", "")
+    return ""
+
+def compile_layer(elem, mod_name, scale=1.0):
+    # Returns the compiled layer, or None for an element that can never draw anything
+    elem_type = elem.get("type")
+    if elem_type == "background":
+        path = elem.get("path")
+        if not path or not os.path.isfile(path): return FillLayer("fill", elem.get("color", "#FFFFFF"))
+        return ImageLayer("background", path, elem.get("color", "#FFFFFF"), _placement(elem, scale))
+    elif elem_type == "image":
+        path = elem.get("path")
+        if not path or not os.path.isfile(path): return None
+        return ImageLayer("image", path, None, _placement(elem, scale))
+    elif elem_type == "bike_image":
+        return BikeImageLayer("bike_image", _placement(elem, scale))
+    elif elem_type == "text":
+        source = elem.get("dataSource")
+        text = None if source in BIKE_TEXT_SOURCES else _static_text(elem, mod_name)
+        if text == "": return None
+        try: font_size = int(elem.get("size", 20))
+        except (ValueError, TypeError): font_size = None
+        sprite_key = (
+            elem.get("font_path", "arial.ttf"), _scale_length(font_size, scale), elem.get("color", "#FFFFFF"),
+            _scale_length(int(elem.get("outline_size", 0)), scale), elem.get("outline_color", "#000000"),
+            elem.get("outline_shape", "square"), int(elem.get("rotation", 0)),
+        )
+        return TextLayer("text", source, text, sprite_key, _scale_position(elem, scale))
+    return None
+
+def compile_render_plan(preview_elements, mod_name, thumbnail_folder, bike_data, size=PREVIEW_SIZE, scale=1.0):
+    layers = []
+    for elem in preview_elements:
+        if not elem.get("visible", True): continue
+        layer = compile_layer(elem, mod_name, scale)
+        if layer is not None: layers.append(layer)
+    bike_names = {}
+    for name, bike_id in bike_data: bike_names.setdefault(bike_id, name)
+    return RenderPlan(tuple(layers), mod_name, thumbnail_folder, bike_names, tuple(size), scale, scaled_size(size, scale))
@@ -0,0 +1,118 @@
+# --- Filename: src/render_worker.py ---
+import threading
+import time
+from collections import deque
+
+LATENCY_WINDOW = 50
+
+class RenderLatencyStats:
+    # Rolling submit-to-display latency of delivered renders, plus counts of renders skipped or dropped
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.render_samples = deque(maxlen=window)
+        self.delivered = 0
+        self.coalesced = 0 # superseded before they started
+        self.dropped = 0   # finished after a newer request came in
+
+    def record(self, latency, render_time):
+        self.samples.append(latency)
+        self.render_samples.append(render_time)
+        self.delivered += 1
+
+    def summary(self):
+        if not self.samples: return {"delivered": 0, "coalesced": self.coalesced, "dropped": self.dropped}
+        ordered = sorted(self.samples)
+        return {
+            "delivered": self.delivered, "coalesced": self.coalesced, "dropped": self.dropped,
+            "last_ms": self.samples[-1] * 1000, "median_ms": ordered[len(ordered) // 2] * 1000,
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            "render_ms": self.render_samples[-1] * 1000,
+        }
+
+class LatestWinsRenderer:
+    # Runs render callables on one background thread. Only the newest submitted request is kept:
+    # a burst of submissions while a render is in flight collapses into a single follow-up render,
+    # and a result that finishes after a newer submission is thrown away. The UI collects finished
+    # results with poll() from its own thread (e.g. from an after() loop), so Tk is only touched there.
+    # Background (idle) jobs run on the same thread, one at a time, only while no request is waiting;
+    # they return nothing and are expected to store their own output (e.g. in a cache).
+    def __init__(self, name="preview-render"):
+        self.stats = RenderLatencyStats()
+        self._cond = threading.Condition()
+        self._pending = None
+        self._idle_jobs = deque()
+        self._result = None
+        self._generation = 0
+        self._in_flight = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, render):
+        with self._cond:
+            self._generation += 1
+            if self._pending is not None: self.stats.coalesced += 1
+            self._pending = (self._generation, render, time.perf_counter())
+            self._cond.notify()
+            return self._generation
+
+    def submit_idle(self, jobs):
+        # Replaces any background jobs that haven't started yet
+        with self._cond:
+            self._idle_jobs = deque(jobs)
+            self._cond.notify()
+
+    def cancel(self):
+        # Forget the pending request and make any in-flight result stale, e.g. when the UI showed a cached frame instead
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+            self._result = None
+
+    def poll(self):
+        # Returns (generation, image, error, latency_seconds) for the newest finished render, or None
+        with self._cond:
+            result, self._result = self._result, None
+        if result is None: return None
+        generation, image, error, submitted, render_time = result
+        latency = time.perf_counter() - submitted
+        if error is None: self.stats.record(latency, render_time)
+        return generation, image, error, latency
+
+    def busy(self):
+        with self._cond:
+            return self._pending is not None or self._in_flight or self._result is not None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._idle_jobs.clear()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._idle_jobs and not self._closed: self._cond.wait()
+                if self._closed: return
+                if self._pending is None:
+                    idle_job = self._idle_jobs.popleft()
+                else:
+                    idle_job = None
+                    (generation, render, submitted), self._pending = self._pending, None
+                    self._in_flight = True
+            if idle_job is not None:
+                try: idle_job()
+                except Exception as e: print(f"Background render failed: {e}")
+                continue
+            start = time.perf_counter()
+            image, error = None, None
+            try: image = render()
+            except Exception as e: error = e
+            render_time = time.perf_counter() - start
+            with self._cond:
+                self._in_flight = False
+                if generation != self._generation:
+                    self.stats.dropped += 1
+                    continue
+                self._result = (generation, image, error, submitted, render_time)
@@ -5,6 +5,14 @@ import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.scrolled import ScrolledFrame
 
+from src.audio_processing import DEFAULT_AUDIO_SETTINGS, SAMPLE_RATES, BIT_DEPTHS
+
+# Display labels for the audio processing choices; 0 keeps the source's value
+SAMPLE_RATE_LABELS = {0: "Keep"} | {rate: f"{rate} Hz" for rate in SAMPLE_RATES}
+BIT_DEPTH_LABELS = {0: "Keep"} | {bits: ("32-bit float" if bits == 32 else f"{bits}-bit") for bits in BIT_DEPTHS}
+CHANNEL_LABELS = {0: "Keep", 1: "Mono", 2: "Stereo"}
+NORMALIZE_LABELS = {"none": "None", "peak": "Peak", "rms": "RMS"}
+
 class SettingsFrame(ttk.Frame):
     name = "Settings"
 
@@ -13,14 +21,18 @@ class SettingsFrame(ttk.Frame):
         self.controller = controller
         # Build UI once on initialization
         self.build_ui()
+        # Refresh paths if they are changed elsewhere
+        self.controller.subscribe("thumbnail_folder_path", self._on_thumbnail_folder_change)
+        self.controller.subscribe("font_folder_paths", self._on_font_folders_change)
 
-    def on_config_update(self):
-        # This can be used to refresh paths if they are changed elsewhere
+    def _on_thumbnail_folder_change(self):
         self.thumbnail_path_var.set(self.controller.get_setting("thumbnail_folder_path", ""))
-        
-        # Refresh font folder list as well
+
+    def _on_font_folders_change(self):
+        paths = list(self.controller.get_setting("font_folder_paths", []))
+        if list(self.font_folder_listbox.get(0, tk.END)) == paths: return
         self.font_folder_listbox.delete(0, tk.END)
-        for path in self.controller.get_setting("font_folder_paths", []):
+        for path in paths:
             self.font_folder_listbox.insert(tk.END, path)
 
 
@@ -55,6 +67,37 @@ class SettingsFrame(ttk.Frame):
         ttk.Entry(asset_frame, textvariable=self.thumbnail_path_var, state="readonly").grid(row=0, column=1, sticky=tk.EW, padx=5)
         ttk.Button(asset_frame, text="Browse...", command=self.browse_for_thumbnail_folder, bootstyle="outline").grid(row=0, column=2)
         
+        # --- PACKAGING SETTINGS ---
+        packaging_frame = ttk.Labelframe(scrollable_frame, text="Packaging", padding=15)
+        packaging_frame.pack(fill='x', expand=True, pady=(0, 20))
+        ttk.Label(packaging_frame, text="Worker Processes (0 = one per CPU core, 1 = sequential):").pack(side='left', padx=(0, 10))
+        self.packaging_workers_var = tk.IntVar(value=self.controller.get_setting("packaging_workers", 0))
+        ttk.Spinbox(packaging_frame, from_=0, to=64, textvariable=self.packaging_workers_var, width=6).pack(side='left')
+        self.packaging_workers_var.trace_add("write", lambda *a: self.save_packaging_workers())
+
+        # --- AUDIO PROCESSING SETTINGS ---
+        audio_frame = ttk.Labelframe(scrollable_frame, text="Audio Processing", padding=15)
+        audio_frame.pack(fill='x', expand=True, pady=(0, 20))
+        audio_frame.columnconfigure(1, weight=1)
+        audio = dict(DEFAULT_AUDIO_SETTINGS); audio.update(self.controller.get_setting("audio_processing") or {})
+        self.audio_vars = {
+            "enabled": tk.BooleanVar(value=audio["enabled"]),
+            "sample_rate": tk.StringVar(value=SAMPLE_RATE_LABELS.get(audio["sample_rate"], "Keep")),
+            "bit_depth": tk.StringVar(value=BIT_DEPTH_LABELS.get(audio["bit_depth"], "Keep")),
+            "channels": tk.StringVar(value=CHANNEL_LABELS.get(audio["channels"], "Keep")),
+            "normalize": tk.StringVar(value=NORMALIZE_LABELS.get(audio["normalize"], "None")),
+            "target_db": tk.DoubleVar(value=audio["target_db"]),
+            "remove_dc": tk.BooleanVar(value=audio["remove_dc"]),
+        }
+        ttk.Checkbutton(audio_frame, text="Convert sounds before packaging (converted files are cached)", variable=self.audio_vars["enabled"], bootstyle="round-toggle").grid(row=0, column=0, columnspan=3, sticky=tk.W, pady=(0, 5))
+        for r, (label, key, labels) in enumerate([("Sample Rate:", "sample_rate", SAMPLE_RATE_LABELS), ("Bit Depth:", "bit_depth", BIT_DEPTH_LABELS), ("Channels:", "channels", CHANNEL_LABELS), ("Normalise:", "normalize", NORMALIZE_LABELS)], start=1):
+            ttk.Label(audio_frame, text=label).grid(row=r, column=0, sticky=tk.W, pady=2)
+            ttk.Combobox(audio_frame, textvariable=self.audio_vars[key], values=list(labels.values()), state="readonly", width=14).grid(row=r, column=1, sticky=tk.W, padx=5)
+        ttk.Label(audio_frame, text="Target (dBFS):").grid(row=5, column=0, sticky=tk.W, pady=2)
+        ttk.Spinbox(audio_frame, from_=-60, to=0, increment=0.5, textvariable=self.audio_vars["target_db"], width=8).grid(row=5, column=1, sticky=tk.W, padx=5)
+        ttk.Checkbutton(audio_frame, text="Remove DC offset", variable=self.audio_vars["remove_dc"]).grid(row=6, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        for var in self.audio_vars.values(): var.trace_add("write", lambda *a: self.save_audio_processing())
+
         # --- FONT SETTINGS ---
         font_frame = ttk.Labelframe(scrollable_frame, text="Font Configuration", padding=15)
         font_frame.pack(fill='x', expand=True, pady=(0, 20))
@@ -124,6 +167,28 @@ class SettingsFrame(ttk.Frame):
         new_paths = self.font_folder_listbox.get(0, tk.END)
         self.controller.update_font_folder_paths(list(new_paths))
 
+    def save_packaging_workers(self):
+        try: workers = max(0, int(self.packaging_workers_var.get()))
+        except (tk.TclError, ValueError): return
+        if workers != self.controller.get_setting("packaging_workers", 0):
+            self.controller.update_setting("packaging_workers", workers, broadcast=False)
+
+    def save_audio_processing(self):
+        def key_for(labels, label): return next((k for k, v in labels.items() if v == label), 0)
+        try: target_db = float(self.audio_vars["target_db"].get())
+        except (tk.TclError, ValueError): return
+        settings = {
+            "enabled": bool(self.audio_vars["enabled"].get()),
+            "sample_rate": key_for(SAMPLE_RATE_LABELS, self.audio_vars["sample_rate"].get()),
+            "bit_depth": key_for(BIT_DEPTH_LABELS, self.audio_vars["bit_depth"].get()),
+            "channels": key_for(CHANNEL_LABELS, self.audio_vars["channels"].get()),
+            "normalize": key_for(NORMALIZE_LABELS, self.audio_vars["normalize"].get()) or "none",
+            "target_db": max(-60.0, min(0.0, target_db)),
+            "remove_dc": bool(self.audio_vars["remove_dc"].get()),
+        }
+        if settings != self.controller.get_setting("audio_processing"):
+            self.controller.update_setting("audio_processing", settings, broadcast=False)
+
     def browse_for_thumbnail_folder(self):
         folder = filedialog.askdirectory(title="Select Folder Containing Bike Thumbnails")
         if folder:
@@ -0,0 +1,20 @@
+# --- Filename: src/startup_trace.py ---
+# Startup timing trace: mark() records how long after this module was first imported (the first
+# import in smx_sound_creator.py) each startup stage finished. Set SMX_STARTUP_TRACE=1 to print
+# the marks as they happen.
+import os
+import time
+
+_start = time.perf_counter()
+_marks = []
+ENABLED = bool(os.environ.get("SMX_STARTUP_TRACE"))
+
+def mark(label):
+    # Only the first mark for a label counts, so "first preview shown" etc. can be marked unconditionally
+    if any(existing == label for existing, _ in _marks): return
+    elapsed = time.perf_counter() - _start
+    _marks.append((label, elapsed))
+    if ENABLED: print(f"[startup] {elapsed * 1000:8.1f} ms  {label}")
+
+def marks():
+    return list(_marks)
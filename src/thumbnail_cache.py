@@ -0,0 +1,106 @@
+# --- Filename: src/thumbnail_cache.py ---
+import os
+import io
+import threading
+from PIL import Image
+
+from src.app_storage import user_cache_dir, atomic_write, atomic_write_json, read_json
+
+THUMBNAIL_SIZE = (96, 96)
+ATLAS_COLUMNS = 8
+ATLAS_VERSION = 1
+
+class ThumbnailAtlas:
+    # Small thumbnails of the bike images, packed into one PNG atlas on disk with a JSON index.
+    # Each entry is keyed by the source's absolute path and remembers its mtime and size, so an
+    # edited source is re-thumbnailed into the same cell. Thread-safe; get_thumbnail() is meant
+    # to be called from a loader thread, never the Tk thread.
+    def __init__(self, folder, size=THUMBNAIL_SIZE):
+        self.size = tuple(size)
+        self.atlas_path = os.path.join(folder, "bike_thumbnails.png")
+        self.index_path = os.path.join(folder, "bike_thumbnails.json")
+        self.entries = {}
+        self._atlas = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        index = read_json(self.index_path, {})
+        if isinstance(index, dict) and index.get("version") == ATLAS_VERSION and index.get("cell") == list(self.size):
+            self.entries = index.get("entries", {})
+
+    def get_thumbnail(self, path):
+        # Returns an RGBA thumbnail, or None when the source doesn't exist. Decoding errors propagate.
+        try: st = os.stat(path)
+        except (OSError, TypeError, ValueError): return None
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["bytes"] == st.st_size:
+                cell = self._crop(key)
+                if cell is not None: return cell
+        with Image.open(path) as source:
+            thumb = source.convert("RGBA")
+        thumb.thumbnail(self.size, Image.Resampling.LANCZOS)
+        with self._lock: self._put(key, st, thumb)
+        return thumb
+
+    def _load_atlas(self):
+        if self._atlas is None:
+            try:
+                with Image.open(self.atlas_path) as atlas: self._atlas = atlas.convert("RGBA")
+            except (OSError, ValueError):
+                # A missing or unreadable atlas invalidates every index entry
+                self._atlas = Image.new("RGBA", (self.size[0] * ATLAS_COLUMNS, self.size[1]))
+                self.entries = {}
+        return self._atlas
+
+    def _cell_box(self, slot, width, height):
+        left, top = (slot % ATLAS_COLUMNS) * self.size[0], (slot // ATLAS_COLUMNS) * self.size[1]
+        return (left, top, left + width, top + height)
+
+    def _crop(self, key):
+        atlas = self._load_atlas()
+        # Loading the atlas may have dropped the index (missing or unreadable file), so look the entry up after
+        entry = self.entries.get(key)
+        if entry is None: return None
+        box = self._cell_box(entry["slot"], entry["width"], entry["height"])
+        if box[3] > atlas.height: return None
+        return atlas.crop(box)
+
+    def _put(self, key, st, thumb):
+        atlas = self._load_atlas()
+        entry = self.entries.get(key)
+        if entry: slot = entry["slot"]
+        else:
+            used = {e["slot"] for e in self.entries.values()}
+            slot = next(i for i in range(len(used) + 1) if i not in used)
+        rows_needed = slot // ATLAS_COLUMNS + 1
+        if atlas.height < rows_needed * self.size[1]:
+            grown = Image.new("RGBA", (atlas.width, rows_needed * self.size[1]))
+            grown.paste(atlas, (0, 0))
+            self._atlas = atlas = grown
+        left, top, _, _ = self._cell_box(slot, 0, 0)
+        atlas.paste((0, 0, 0, 0), (left, top, left + self.size[0], top + self.size[1]))
+        atlas.paste(thumb, (left, top))
+        self.entries[key] = {"slot": slot, "width": thumb.width, "height": thumb.height, "mtime_ns": st.st_mtime_ns, "bytes": st.st_size}
+        self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty: return
+            # Forget sources that are gone; their cells are reused by the next new thumbnail
+            self.entries = {path: entry for path, entry in self.entries.items() if os.path.exists(path)}
+            buffer = io.BytesIO()
+            self._atlas.save(buffer, "PNG", compress_level=1)
+            # Atlas first, then the index that points into it
+            atomic_write(self.atlas_path, buffer.getvalue())
+            atomic_write_json(self.index_path, {"version": ATLAS_VERSION, "cell": list(self.size), "entries": self.entries})
+            self._dirty = False
+
+_atlas = None
+_atlas_lock = threading.Lock()
+
+def get_thumbnail_atlas():
+    global _atlas
+    with _atlas_lock:
+        if _atlas is None: _atlas = ThumbnailAtlas(user_cache_dir("thumbnails"))
+        return _atlas
@@ -0,0 +1,199 @@
+# --- Filename: src/wav_inspector.py ---
+# Reads a WAV file's format from its RIFF header alone and measures peak, RMS and DC offset by
+# streaming the sample data through a memory map in fixed-size chunks, so even multi-minute files
+# are never loaded whole.
+import os
+import math
+import struct
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from src.app_storage import user_cache_dir, atomic_write_json, read_json
+
+STATS_VERSION = 1
+CHUNK_FRAMES = 1 << 18
+WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_EXTENSIBLE = 0x0001, 0x0003, 0xFFFE
+CLIP_LEVEL = 0.999 # Peaks at or above this (of full scale) are reported as clipping
+DC_WARNING_LEVEL = 0.01
+
+WavInfo = namedtuple("WavInfo", ["format_tag", "channels", "sample_rate", "bits_per_sample", "frames", "duration", "data_offset", "data_size"])
+# Levels are fractions of full scale; dc_offset is signed (the mean sample value)
+WavStats = namedtuple("WavStats", ["peak", "rms", "dc_offset"])
+
+class WavFormatError(ValueError):
+    pass
+
+def parse_wav_header(path):
+    # Walks the RIFF chunks up to "data" with seeks; raises WavFormatError for anything that isn't a
+    # playable PCM / float WAV, OSError if the file can't be read
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE": raise WavFormatError("not a RIFF/WAVE file")
+        file_size = os.fstat(f.fileno()).st_size
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8: raise WavFormatError("no data chunk" if fmt else "no fmt chunk")
+            chunk_id, chunk_size = header[:4], struct.unpack("<I", header[4:])[0]
+            if chunk_id == b"fmt ":
+                if chunk_size < 16: raise WavFormatError("fmt chunk too short")
+                body = f.read(chunk_size)
+                if len(body) < 16: raise WavFormatError("fmt chunk truncated")
+                format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26: format_tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (format_tag, channels, sample_rate, block_align, bits)
+                if chunk_size % 2: f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None: raise WavFormatError("data chunk before fmt chunk")
+                data_offset = f.tell()
+                break
+            else: f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    format_tag, channels, sample_rate, block_align, bits = fmt
+    if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT): raise WavFormatError(f"unsupported encoding (format tag 0x{format_tag:04x})")
+    if format_tag == WAVE_FORMAT_PCM and bits not in (8, 16, 24, 32): raise WavFormatError(f"unsupported bit depth {bits}")
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits not in (32, 64): raise WavFormatError(f"unsupported float bit depth {bits}")
+    if channels < 1 or sample_rate < 1 or block_align != channels * bits // 8: raise WavFormatError("inconsistent fmt chunk")
+    # A truncated file (or a streaming writer's placeholder size) is measured by what is really there
+    data_size = min(chunk_size, file_size - data_offset)
+    frames = data_size // block_align
+    return WavInfo(format_tag, channels, sample_rate, bits, frames, frames / sample_rate, data_offset, frames * block_align)
+
+def _sample_dtype(info):
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT: return np.dtype("<f4" if info.bits_per_sample == 32 else "<f8")
+    return {8: np.dtype("u1"), 16: np.dtype("<i2"), 24: np.dtype("u1"), 32: np.dtype("<i4")}[info.bits_per_sample]
+
+def _decode(raw, info):
+    # One chunk of raw sample values -> array of shape (frames, channels) whose ordering matches the
+    # sample values (24-bit is assembled into the top of an int32 so the sign comes along)
+    if info.bits_per_sample == 24 and info.format_tag == WAVE_FORMAT_PCM:
+        triples = raw.reshape(-1, 3).astype(np.int32)
+        raw = (triples[:, 0] << 8) | (triples[:, 1] << 16) | (triples[:, 2] << 24)
+    return raw.reshape(-1, info.channels)
+
+def _normalise(values, info, dtype=np.float64):
+    # Decoded values -> floats in [-1, 1]
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT: return values.astype(dtype)
+    bits = info.bits_per_sample
+    if bits == 8: return (values.astype(dtype) - dtype(128.0)) / dtype(128.0)
+    if bits == 24: return values.astype(dtype) / dtype(2147483648.0)
+    return values.astype(dtype) / dtype(1 << (bits - 1))
+
+def iter_sample_chunks(path, info, chunk_frames=CHUNK_FRAMES):
+    # Yields (first frame, decoded chunk of shape (frames, channels)) over the memory-mapped data
+    if info.frames == 0: return
+    dtype = _sample_dtype(info)
+    values_per_frame = info.channels * info.bits_per_sample // 8 // dtype.itemsize
+    samples = np.memmap(path, dtype=dtype, mode='r', offset=info.data_offset, shape=(info.frames * values_per_frame,))
+    try:
+        for start in range(0, info.frames, chunk_frames):
+            yield start, _decode(samples[start * values_per_frame:(start + chunk_frames) * values_per_frame], info)
+    finally: del samples
+
+def read_float_frames(path, info, first, last):
+    # Frames [first, last) as float64 (frames, channels), read through a memory map of just that range
+    first, last = max(first, 0), min(last, info.frames)
+    if last <= first: return np.zeros((0, info.channels))
+    dtype = _sample_dtype(info)
+    values_per_frame = info.channels * info.bits_per_sample // 8 // dtype.itemsize
+    block_align = info.channels * info.bits_per_sample // 8
+    samples = np.memmap(path, dtype=dtype, mode='r', offset=info.data_offset + first * block_align, shape=((last - first) * values_per_frame,))
+    try: return _normalise(_decode(np.array(samples), info), info)
+    finally: del samples
+
+def iter_float_chunks(path, info, chunk_frames=CHUNK_FRAMES, dtype=np.float64):
+    # Like iter_sample_chunks, with the samples as floats in [-1, 1]
+    for start, chunk in iter_sample_chunks(path, info, chunk_frames): yield start, _normalise(chunk, info, dtype)
+
+def compute_stats(path, info, chunk_frames=CHUNK_FRAMES):
+    if info.frames == 0: return WavStats(0.0, 0.0, 0.0)
+    peak, total, total_sq = 0.0, 0.0, 0.0
+    for _, chunk in iter_sample_chunks(path, info, chunk_frames):
+        flat = _normalise(chunk.ravel(), info)
+        peak = max(peak, float(np.max(np.abs(flat))))
+        total += float(np.sum(flat))
+        total_sq += float(np.dot(flat, flat))
+    count = info.frames * info.channels
+    return WavStats(peak, (total_sq / count) ** 0.5, total / count)
+
+def waveform_envelope(path, info, columns, chunk_frames=CHUNK_FRAMES):
+    # Min/max over all channels for each of `columns` equal slices of the file, as floats in [-1, 1].
+    # Each chunk's interleaved samples are reduced per column slice with one reduceat call, in the
+    # samples' own dtype; only the final column values are converted to float.
+    if info.frames == 0: return np.zeros(columns), np.zeros(columns)
+    mins, maxs = np.full(columns, np.inf), np.full(columns, -np.inf)
+    edges = (np.arange(columns + 1, dtype=np.int64) * info.frames) // columns
+    for start, chunk in iter_sample_chunks(path, info, chunk_frames):
+        end = start + len(chunk)
+        flat = chunk.ravel()
+        first, last = np.searchsorted(edges, start, side='right') - 1, np.searchsorted(edges, end - 1, side='right') - 1
+        cols = np.arange(first, last + 1)
+        cols = cols[edges[cols] < end]
+        bounds = np.clip(edges[cols], start, end) - start
+        keep = np.append(bounds[1:] > bounds[:-1], True) # Columns without frames of their own in this chunk
+        cols, bounds = cols[keep], bounds[keep]
+        np.minimum.at(mins, cols, np.minimum.reduceat(flat, bounds * info.channels))
+        np.maximum.at(maxs, cols, np.maximum.reduceat(flat, bounds * info.channels))
+    # Columns narrower than a frame take the frame they fall in
+    empty = ~np.isfinite(mins)
+    if empty.any():
+        filled = np.flatnonzero(~empty)
+        nearest = filled[np.clip(np.searchsorted(filled, np.flatnonzero(empty)) - 1, 0, len(filled) - 1)]
+        mins[empty], maxs[empty] = mins[nearest], maxs[nearest]
+    return _normalise(mins, info), _normalise(maxs, info)
+
+def describe(info, stats):
+    # One line for the sound row, e.g. "44.1 kHz · 16-bit · Stereo · 12.3 s · Peak -0.3 dBFS · RMS -18.2 dBFS"
+    channels = {1: "Mono", 2: "Stereo"}.get(info.channels, f"{info.channels} ch")
+    kind = "float" if info.format_tag == WAVE_FORMAT_IEEE_FLOAT else "bit"
+    parts = [f"{info.sample_rate / 1000:g} kHz", f"{info.bits_per_sample}-{kind}", channels, f"{info.duration:.1f} s"]
+    if stats is not None:
+        parts += [f"Peak {_dbfs(stats.peak)}", f"RMS {_dbfs(stats.rms)}"]
+        if abs(stats.dc_offset) >= DC_WARNING_LEVEL: parts.append(f"DC {stats.dc_offset * 100:+.1f}%")
+    return " · ".join(parts)
+
+def _dbfs(level):
+    return "-inf dBFS" if level <= 0 else f"{20 * math.log10(level):.1f} dBFS"
+
+def warnings_for(info, stats):
+    warnings = []
+    if info.frames == 0: warnings.append("no audio data")
+    if stats is not None and stats.peak >= CLIP_LEVEL: warnings.append("clipping")
+    if stats is not None and abs(stats.dc_offset) >= DC_WARNING_LEVEL: warnings.append("DC offset")
+    return warnings
+
+class WavInspector:
+    # Inspects sound files in the background. Results are cached in memory and in a per-user index
+    # keyed by absolute path, mtime and size, so reselecting a file (or restarting) doesn't rescan it.
+    # on_result(path, info, stats, error) is called on the worker thread.
+    def __init__(self, index_path=None, max_workers=2):
+        self.index_path = index_path or os.path.join(user_cache_dir("sounds"), "wav_stats.json")
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wav-inspect")
+        self.entries = {}
+        data = read_json(self.index_path, {})
+        if isinstance(data, dict) and data.get("version") == STATS_VERSION: self.entries = data.get("entries", {})
+
+    def inspect(self, path):
+        # (info, stats) for the file; raises WavFormatError / OSError
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock: entry = self.entries.get(key)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["bytes"] == st.st_size:
+            return WavInfo(*entry["info"]), WavStats(*entry["stats"])
+        info = parse_wav_header(path)
+        stats = compute_stats(path, info)
+        with self._lock:
+            self.entries[key] = {"mtime_ns": st.st_mtime_ns, "bytes": st.st_size, "info": list(info), "stats": list(stats)}
+            self.entries = {p: e for p, e in self.entries.items() if os.path.exists(p)}
+            try: atomic_write_json(self.index_path, {"version": STATS_VERSION, "entries": self.entries})
+            except OSError as e: print(f"Could not save the sound stats cache: {e}")
+        return info, stats
+
+    def inspect_async(self, path, on_result):
+        def run():
+            try: info, stats = self.inspect(path)
+            except (OSError, ValueError) as e: on_result(path, None, None, e)
+            else: on_result(path, info, stats, None)
+        self._pool.submit(run)
@@ -0,0 +1,69 @@
+# --- Filename: src/waveform_cache.py ---
+import os
+import io
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageColor
+
+from src.app_storage import user_cache_dir, atomic_write, hash_file
+from src.wav_inspector import parse_wav_header, waveform_envelope
+
+WAVEFORM_SIZE = (260, 28)
+WAVEFORM_VERSION = 1
+
+def render_waveform(mins, maxs, size, color, background):
+    # One column per envelope value, filled from its min to its max around the centre line
+    width, height = size
+    rows = np.arange(height)[:, None]
+    half = (height - 1) / 2.0
+    top = np.round(half - np.clip(maxs, -1, 1) * half)
+    bottom = np.round(half - np.clip(mins, -1, 1) * half)
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[:] = ImageColor.getrgb(background) + (255,)
+    pixels[(rows >= top) & (rows <= bottom)] = ImageColor.getrgb(color) + (255,)
+    return Image.fromarray(pixels, "RGBA")
+
+class WaveformCache:
+    # Waveform PNGs in a per-user folder, named after the sound's content hash and the drawing
+    # parameters, so the same audio under another name or path reuses its image. Content hashes are
+    # remembered per (path, mtime, size) for the session, so a file is only re-read when it changes.
+    # render_async's on_result(path, image, error) is called on the worker thread.
+    def __init__(self, folder=None):
+        self.folder = folder or user_cache_dir("waveforms")
+        self._hashes = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="waveform")
+
+    def content_hash(self, path):
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock: cached = self._hashes.get(key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size: return cached[2]
+        digest = hash_file(path)
+        with self._lock: self._hashes[key] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def get_waveform(self, path, size=WAVEFORM_SIZE, color="#ffffff", background="#000000"):
+        # Raises WavFormatError / OSError for a file that can't be drawn
+        params = f"{WAVEFORM_VERSION}|{size[0]}x{size[1]}|{color}|{background}"
+        name = hashlib.sha1(f"{self.content_hash(path)}|{params}".encode("utf-8")).hexdigest() + ".png"
+        cache_path = os.path.join(self.folder, name)
+        try:
+            with Image.open(cache_path) as cached: return cached.convert("RGBA")
+        except (OSError, ValueError): pass
+        mins, maxs = waveform_envelope(path, parse_wav_header(path), size[0])
+        image = render_waveform(mins, maxs, size, color, background)
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        try: atomic_write(cache_path, buffer.getvalue())
+        except OSError as e: print(f"Could not save the waveform cache: {e}")
+        return image
+
+    def render_async(self, path, on_result, **options):
+        def run():
+            try: image = self.get_waveform(path, **options)
+            except (OSError, ValueError) as e: on_result(path, None, e)
+            else: on_result(path, image, None)
+        self._pool.submit(run)
@@ -0,0 +1,28 @@
+# --- Filename: tests/test_audio_processing.py ---
+import os
+import sys
+import wave
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.audio_processing import convert_wav, DEFAULT_AUDIO_SETTINGS
+
+def _write_sine(path, sample_rate=48000, seconds=1.0, channels=2):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    tone = 0.5 * np.sin(2 * np.pi * 440.0 * t)
+    samples = np.round(np.repeat(tone[:, None], channels, axis=1) * 32767).astype("<i2")
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels); w.setsampwidth(2); w.setframerate(sample_rate)
+        w.writeframes(samples.tobytes())
+
+@pytest.mark.parametrize("sample_rate", [44100, 96000])
+def test_resampling_does_not_depend_on_chunk_size(tmp_path, sample_rate):
+    # Chunk boundaries must not leave glitches: a small chunk size gives the same bytes as the default
+    src = tmp_path / "sine.wav"
+    _write_sine(src)
+    settings = dict(DEFAULT_AUDIO_SETTINGS, enabled=True, sample_rate=sample_rate)
+    convert_wav(str(src), str(tmp_path / "whole.wav"), settings)
+    convert_wav(str(src), str(tmp_path / "chunked.wav"), settings, chunk_frames=10000)
+    assert (tmp_path / "chunked.wav").read_bytes() == (tmp_path / "whole.wav").read_bytes()
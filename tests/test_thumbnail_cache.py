@@ -0,0 +1,24 @@
+# --- Filename: tests/test_thumbnail_cache.py ---
+import os
+import sys
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.thumbnail_cache import ThumbnailAtlas
+
+def test_missing_atlas_with_index_regenerates_thumbnail(tmp_path):
+    source = tmp_path / "bike.png"
+    Image.new("RGBA", (200, 100), (200, 10, 10, 255)).save(source)
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    atlas = ThumbnailAtlas(str(cache))
+    atlas.get_thumbnail(str(source))
+    atlas.save()
+    # The index survives but the atlas it points into is gone
+    os.remove(atlas.atlas_path)
+    reloaded = ThumbnailAtlas(str(cache))
+    assert reloaded.entries
+    thumb = reloaded.get_thumbnail(str(source))
+    assert thumb.size == (96, 48)
+    assert thumb.getpixel((10, 10)) == (200, 10, 10, 255)